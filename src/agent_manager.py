@@ -1,26 +1,46 @@
-from typing import List, Dict, Any, Optional, Type
+from typing import List, Dict, Any, Optional, Type, Iterator, AsyncIterator
+import asyncio
 import logging
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from smolagents import CodeAgent, Tool
 from .llm import LLMProvider, OpenAIProvider
-from .tools.base_tools import (
-    WebSearchTool,
-    WebScrapeTool,
-    SystemCommandTool,
-    FileSystemTool,
-    TwitterSearchTool,
-    SystemInfoTool
-)
+from . import llm_cache
+from .metrics import RequestIdFilter, timed
+from .tools.base_tools import DEFAULT_TOOLS, TOOL_METADATA, tool_metadata
 
 # Configure logging
 logger = logging.getLogger("agent_manager")
 logger.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s')
 
 # Add console handler
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(formatter)
+console_handler.addFilter(RequestIdFilter())
 logger.addHandler(console_handler)
 
+# Agent runs execute tool code and block on LLM calls, so they get their own worker
+# pool instead of competing with file and socket work on the loop's default executor.
+# AgentManager holds live clients and tools and can't be pickled, which rules out a process pool.
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", os.cpu_count() or 4))
+agent_executor = ThreadPoolExecutor(max_workers=AGENT_WORKERS, thread_name_prefix="agent")
+
+async def _run_in_agent_executor(func, *args) -> Any:
+    """Run a blocking call on the agent worker pool, keeping the caller's context"""
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(agent_executor, ctx.run, func, *args)
+
+async def _iterate_in_thread(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """Advance a blocking iterator from a worker thread"""
+    sentinel = object()
+    while True:
+        item = await _run_in_agent_executor(next, iterator, sentinel)
+        if item is sentinel:
+            break
+        yield item
+
 class AgentManager:
     """Manages agent configuration and execution"""
     
@@ -36,31 +56,28 @@ class AgentManager:
         self.max_steps = max_steps
         self.verbose = verbose
         
-        # Initialize default tools
-        self.tools = [
-            WebSearchTool(),
-            WebScrapeTool(),
-            SystemCommandTool(),
-            FileSystemTool(),
-            TwitterSearchTool(),
-            SystemInfoTool()
-        ]
+        # Default tools are shared instances; the list itself is per manager
+        self.tools = list(DEFAULT_TOOLS)
         
         # Add any additional tools
         if additional_tools:
             self.tools.extend(additional_tools)
+        self._tools_info: Optional[List[Dict[str, Any]]] = None if additional_tools else TOOL_METADATA
             
         # Set up authorized imports
-        self.authorized_imports = {
+        self._set_authorized_imports({
             'os', 'sys', 'json', 'time', 'datetime', 'math', 
             'random', 'requests', 'numpy', 'pandas'
-        }
-        if additional_imports:
-            self.authorized_imports.update(additional_imports)
+        }.union(additional_imports or []))
             
         # Initialize the agent
         self.agent = self._initialize_agent()
         
+    def _set_authorized_imports(self, imports: Any) -> None:
+        """Store authorized imports along with their sorted list form"""
+        self.authorized_imports = frozenset(imports)
+        self._authorized_imports_list = sorted(self.authorized_imports)
+
     def _initialize_agent(self) -> CodeAgent:
         """Initialize the agent with current configuration"""
         logger.info("Initializing CodeAgent")
@@ -69,47 +86,130 @@ class AgentManager:
             model=self.llm_provider,
             max_steps=self.max_steps,
             verbose=self.verbose,
-            additional_authorized_imports=list(self.authorized_imports)
+            additional_authorized_imports=list(self._authorized_imports_list)
         )
 
+    def _executor_tools(self) -> Optional[Dict[str, Any]]:
+        """Tool registry of the agent's local Python executor, if it has one"""
+        executor = getattr(self.agent, 'python_executor', None)
+        return getattr(executor, 'static_tools', None)
+
     def add_tool(self, tool: Tool) -> None:
         """Add a new tool to the agent's toolset"""
         self.tools.append(tool)
-        self.agent = self._initialize_agent()
+        self._tools_info = None
+        # Register on the live agent instead of rebuilding it
+        self.agent.tools[tool.name] = tool
+        executor_tools = self._executor_tools()
+        if executor_tools is not None:
+            executor_tools[tool.name] = tool
 
     def remove_tool(self, tool_name: str) -> None:
         """Remove a tool from the agent's toolset"""
         self.tools = [t for t in self.tools if t.name != tool_name]
-        self.agent = self._initialize_agent()
+        self._tools_info = None
+        self.agent.tools.pop(tool_name, None)
+        executor_tools = self._executor_tools()
+        if executor_tools is not None:
+            executor_tools.pop(tool_name, None)
 
     def get_available_tools(self) -> List[Dict[str, Any]]:
         """Get information about available tools"""
-        return [{
-            'name': tool.name,
-            'description': tool.description,
-            'inputs': tool.inputs,
-            'output_type': tool.output_type
-        } for tool in self.tools]
+        # Tool metadata is static, so it is only rebuilt after add_tool/remove_tool
+        if self._tools_info is None:
+            self._tools_info = [tool_metadata(tool) for tool in self.tools]
+        return self._tools_info
+
+    def _provider(self) -> Any:
+        """The real provider, looking through wrappers such as BatchedProvider"""
+        return getattr(self.llm_provider, 'llm_provider', self.llm_provider)
+
+    def cache_key(self, request: str) -> str:
+        """Cache key for a request against the current provider, model and tools"""
+        provider = self._provider()
+        return llm_cache.make_key(
+            provider.__class__.__name__,
+            getattr(provider, 'model_name', None),
+            request,
+            [tool.name for tool in self.tools]
+        )
+
+    def _run_succeeded(self) -> bool:
+        """Whether the last agent run reached its final answer without any failed step"""
+        # Provider errors and the max-steps fallback answer all leave an error on a step
+        return not any(getattr(step, 'error', None) is not None for step in self.agent.logs)
+
+    def _cache_final_answer(self, key: str, steps: Iterator[Any]) -> Iterator[Any]:
+        """Pass streamed steps through and cache the final answer once the run succeeds"""
+        final_answer = None
+        for step in steps:
+            final_answer = step
+            yield step
+        if final_answer is not None and self._run_succeeded():
+            llm_cache.put(key, str(final_answer))
+
+    def _timed_steps(self, provider: str, steps: Iterator[Any]) -> Iterator[Any]:
+        """Pass streamed steps through, timing the agent stage until the run is exhausted"""
+        with timed("agent", provider):
+            yield from steps
 
     def process_request(
         self,
         request: str,
         stream: bool = False,
-        additional_args: Optional[Dict[str, Any]] = None
+        additional_args: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True
     ) -> Any:
         """Process a user request using the agent"""
         try:
-            return self.agent.run(
-                request,
-                stream=stream,
-                additional_args=additional_args or {}
-            )
+            # Extra arguments change the outcome, so only plain prompts are cached
+            key = None
+            if use_cache and not additional_args:
+                key = self.cache_key(request)
+                cached = llm_cache.get(key)
+                if cached is not None:
+                    logger.info(f"Cache hit, ~{(len(request) + len(cached)) // 4} tokens saved")
+                    return cached
+
+            provider = type(self._provider()).__name__
+            if stream:
+                # A streamed run does its work as the steps are consumed, so it is timed until exhausted
+                response = self.agent.run(request, stream=True, additional_args=additional_args or {})
+                if hasattr(response, '__iter__') and not isinstance(response, str):
+                    response = self._timed_steps(provider, response)
+            else:
+                with timed("agent", provider):
+                    response = self.agent.run(
+                        request,
+                        stream=False,
+                        additional_args=additional_args or {}
+                    )
+            if key is not None:
+                if stream and hasattr(response, '__iter__') and not isinstance(response, str):
+                    return self._cache_final_answer(key, response)
+                # Cached answers are shared across sessions, so failed runs are never stored
+                if self._run_succeeded():
+                    llm_cache.put(key, str(response))
+            return response
         except Exception as e:
             return {
                 'error': True,
                 'message': f"Error processing request: {str(e)}"
             }
 
+    async def aprocess_request(
+        self,
+        request: str,
+        stream: bool = False,
+        additional_args: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True
+    ) -> Any:
+        """Process a user request off the event loop so concurrent sessions can be batched"""
+        response = await _run_in_agent_executor(self.process_request, request, stream, additional_args, use_cache)
+        if stream and hasattr(response, '__iter__') and not isinstance(response, (str, dict)):
+            return _iterate_in_thread(iter(response))
+        return response
+
     def update_configuration(
         self,
         llm_provider: Optional[LLMProvider] = None,
@@ -120,13 +220,17 @@ class AgentManager:
         """Update the agent's configuration"""
         if llm_provider:
             self.llm_provider = llm_provider
+            self.agent.model = llm_provider
         if max_steps is not None:
             self.max_steps = max_steps
+            self.agent.max_steps = max_steps
         if verbose is not None:
             self.verbose = verbose
-        if additional_imports:
-            self.authorized_imports.update(additional_imports)
-        self.agent = self._initialize_agent()
+            self.agent.verbose = verbose
+        # Authorized imports are baked into the system prompt and executor, so they need a rebuild
+        if additional_imports and not self.authorized_imports.issuperset(additional_imports):
+            self._set_authorized_imports(self.authorized_imports.union(additional_imports))
+            self.agent = self._initialize_agent()
 
     def get_agent_status(self) -> Dict[str, Any]:
         """Get current status of the agent"""
@@ -135,5 +239,5 @@ class AgentManager:
             'num_tools': len(self.tools),
             'max_steps': self.max_steps,
             'verbose': self.verbose,
-            'authorized_imports': sorted(list(self.authorized_imports))
+            'authorized_imports': list(self._authorized_imports_list)
         } 
\ No newline at end of file
@@ -1,32 +1,52 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, BackgroundTasks, UploadFile
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import json
+import logging
 import os
-from typing import Dict, Any, List
-from dotenv import load_dotenv
-from .agent_manager import AgentManager
-from .llm import OpenAIProvider, AnthropicProvider, OllamaProvider, DeepSeekProvider
-import requests
+from pathlib import PurePosixPath
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+from .agent_manager import AgentManager, agent_executor
+from .tools.base_tools import TOOL_METADATA
+from . import session_store
+from .settings import get_settings
+from .llm import LLMProvider, OpenAIProvider, AnthropicProvider, OllamaProvider, DeepSeekProvider
+from .batcher import RequestBatcher, BatchedProvider
+from .metrics import request_id, timed
+from prometheus_client import make_asgi_app
+from cachetools import LRUCache, TTLCache
+from starlette.websockets import WebSocketState
+import aiofiles
+import httpx
 import openai
+import orjson
 import uuid
 import anthropic
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger("app")
 
 # Create artifacts directory if it doesn't exist
 os.makedirs("artifacts", exist_ok=True)
 
+# Uploads are copied to disk in 1 MiB chunks
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Upper bound on chat sessions kept in memory
+MAX_CHAT_SESSIONS = 1000
+
 # Initialize FastAPI app
-app = FastAPI(title="AgentX Assistant")
+app = FastAPI(title="AgentX Assistant", default_response_class=ORJSONResponse)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="src/static"), name="static")
 app.mount("/artifacts", StaticFiles(directory="artifacts"), name="artifacts")
 
+# Expose Prometheus metrics
+app.mount("/metrics", make_asgi_app())
+
 # Configure templates
 templates = Jinja2Templates(directory="src/templates")
 
@@ -39,21 +59,239 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Chat sessions
-chat_sessions: Dict[str, AgentManager] = {}
-active_requests: Dict[str, Any] = {}
+class SessionCache(LRUCache):
+    """Bounded LRU of chat sessions that also drops connection state on eviction"""
+
+    def popitem(self):
+        session_id, agent_manager = super().popitem()
+        active_connections.pop(session_id, None)
+        active_requests.pop(session_id, None)
+        return session_id, agent_manager
+
+# Chat sessions, least recently used evicted first
+chat_sessions: Dict[str, AgentManager] = SessionCache(maxsize=MAX_CHAT_SESSIONS)
+# Id of the request each session is running, if any
+active_requests: Dict[str, Optional[str]] = {}
 
 # WebSocket connections
 active_connections: Dict[str, Dict[str, Any]] = {}  # session_id -> {websocket, client_id}
 
+async def get_session(session_id: str) -> Optional[AgentManager]:
+    """Find a session's agent manager, rebuilding it if the session was created by another worker"""
+    agent_manager = chat_sessions.get(session_id)
+    if agent_manager is None and await session_store.get_state(session_id) is not None:
+        agent_manager = AgentManager(llm_provider=None, verbose=True)
+        chat_sessions[session_id] = agent_manager
+    return agent_manager
+
+def _cancel_local_request(session_id: str) -> bool:
+    """Cancel the session's request if it runs in this worker"""
+    message_id = active_requests.get(session_id)
+    if not message_id:
+        return False
+    agent = chat_sessions.get(session_id)
+    if agent and agent.llm_provider:
+        # The provider is pooled, so only this request's streams are closed
+        agent.llm_provider.cancel_request(message_id)
+    active_requests[session_id] = None
+    return True
+
+def _drop_connection(session_id: str, websocket: WebSocket) -> None:
+    """Forget a session's connection, unless it has already been replaced by a newer one"""
+    connection = active_connections.get(session_id)
+    if connection and connection["websocket"] is websocket:
+        del active_connections[session_id]
+
+async def sweep_connections(interval: float = 60):
+    """Periodically drop connections whose sockets have closed"""
+    while True:
+        await asyncio.sleep(interval)
+        for session_id, connection in list(active_connections.items()):
+            websocket = connection["websocket"]
+            if WebSocketState.DISCONNECTED in (websocket.client_state, websocket.application_state):
+                _drop_connection(session_id, websocket)
+
+_sweeper: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_sweeper():
+    """Start the closed-connection sweeper"""
+    global _sweeper
+    _sweeper = asyncio.create_task(sweep_connections())
+
+@app.on_event("shutdown")
+async def stop_sweeper():
+    """Stop the closed-connection sweeper"""
+    if _sweeper:
+        _sweeper.cancel()
+
+async def _deliver_published(session_id: str, payload: str) -> None:
+    """Send a message published by another worker if this worker holds the session's WebSocket"""
+    connection = active_connections.get(session_id)
+    if connection:
+        try:
+            await connection["websocket"].send_bytes(payload.encode())
+        except:
+            _drop_connection(session_id, connection["websocket"])
+
+_listener: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_session_listener():
+    """Receive messages and cancellations routed from other workers"""
+    global _listener
+    if session_store.enabled():
+        _listener = asyncio.create_task(session_store.listen(_deliver_published, _cancel_local_request))
+
+@app.on_event("shutdown")
+async def stop_session_listener():
+    """Stop receiving routed messages"""
+    if _listener:
+        _listener.cancel()
+
+# Shared HTTP connection pool for upstream calls made from request handlers
+_http = httpx.AsyncClient(timeout=5.0, limits=httpx.Limits(max_keepalive_connections=20))
+
+# Model lists rarely change, so keep them briefly per provider
+_models_cache = TTLCache(maxsize=16, ttl=30)
+
+# Work currently running, keyed by what it computes, so duplicate requests can share the result
+_inflight: Dict[str, asyncio.Future] = {}
+
+async def single_flight(
+    key: str,
+    factory: Callable[[], Awaitable[Any]],
+    on_shared: Optional[Callable[[Any], Awaitable[Any]]] = None
+) -> Any:
+    """Run factory once for concurrent callers with the same key and share its result
+
+    Callers that joined a run started by another caller get on_shared awaited with the result.
+    """
+    task = _inflight.get(key)
+    shared = task is not None
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shield the shared task so one caller going away doesn't cancel it for the others
+    result = await asyncio.shield(task)
+    if shared and on_shared is not None:
+        await on_shared(result)
+    return result
+
+# Agent manager shared by read-only endpoints (tools, status)
+_introspection_agent: Optional[AgentManager] = None
+
+def get_introspection_agent() -> AgentManager:
+    """Get the shared agent manager, building it on first use"""
+    global _introspection_agent
+    if _introspection_agent is None:
+        _introspection_agent = AgentManager(llm_provider=None)
+    return _introspection_agent
+
+@app.on_event("startup")
+async def create_introspection_agent():
+    """Build the shared agent manager up front"""
+    try:
+        get_introspection_agent()
+    except Exception as e:
+        logger.error(f"Error creating introspection agent: {str(e)}")
+
+@app.on_event("startup")
+async def check_settings():
+    """Report unconfigured providers once at startup instead of per request"""
+    missing = get_settings().missing_api_keys()
+    if missing:
+        logger.warning(f"No API key configured for: {', '.join(missing)}")
+
+# Coalesces LLM calls from concurrent chat sessions
+batcher = RequestBatcher()
+
+@app.on_event("startup")
+async def start_batcher():
+    """Start the LLM request batcher"""
+    batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    """Stop the LLM request batcher"""
+    await batcher.stop()
+
+@app.on_event("shutdown")
+async def stop_agent_executor():
+    """Stop the agent worker pool without waiting for in-flight runs"""
+    agent_executor.shutdown(wait=False, cancel_futures=True)
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Close the shared HTTP connection pool"""
+    await _http.aclose()
+
+# Provider clients reused across chat requests so their connections stay warm
+PROVIDER_CLASSES = {
+    "ollama": OllamaProvider,
+    "openai": OpenAIProvider,
+    "anthropic": AnthropicProvider,
+    "deepseek": DeepSeekProvider
+}
+_provider_pool: Dict[Tuple[str, str], LLMProvider] = {}
+_provider_pool_lock = asyncio.Lock()
+
+async def get_provider(provider: str, model: str) -> LLMProvider:
+    """Get the pooled provider for a model, creating it on first use"""
+    key = (provider, model)
+    llm_provider = _provider_pool.get(key)
+    if llm_provider is None:
+        async with _provider_pool_lock:
+            llm_provider = _provider_pool.get(key)
+            if llm_provider is None:
+                if provider not in PROVIDER_CLASSES:
+                    raise ValueError(f"Unsupported provider: {provider}")
+                # Route the provider's calls through the batcher
+                llm_provider = BatchedProvider(PROVIDER_CLASSES[provider](model_name=model), batcher)
+                _provider_pool[key] = llm_provider
+    return llm_provider
+
+@app.on_event("shutdown")
+async def close_providers():
+    """Close connections held by pooled providers"""
+    for llm_provider in _provider_pool.values():
+        aclose = getattr(llm_provider.llm_provider, "aclose", None)
+        if aclose:
+            await aclose()
+
 async def broadcast_message(message: Dict[str, Any], session_id: str):
     """Broadcast message to the specific session"""
-    if session_id in active_connections:
+    connection = active_connections.get(session_id)
+    if connection:
         try:
-            await active_connections[session_id]["websocket"].send_json(message)
+            with timed("broadcast"):
+                await connection["websocket"].send_bytes(orjson.dumps(message))
         except:
             # If sending fails, clean up the connection
-            del active_connections[session_id]
+            _drop_connection(session_id, connection["websocket"])
+    elif session_store.enabled():
+        # The WebSocket may be held by another worker
+        with timed("broadcast"):
+            await session_store.publish_message(session_id, orjson.dumps(message).decode())
+
+async def flush_deltas(pending: List[str], message_id: str, session_id: str, done: asyncio.Event, interval: float = 0.03):
+    """Send buffered stream chunks as a single delta every interval until done is set"""
+    while True:
+        try:
+            await asyncio.wait_for(done.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        if pending:
+            delta = "".join(pending)
+            pending.clear()
+            await broadcast_message({
+                "type": "message_delta",
+                "id": message_id,
+                "delta": delta
+            }, session_id)
+        if done.is_set():
+            return
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -65,107 +303,170 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """Handle WebSocket connections for chat"""
     await websocket.accept()
     
+    # Store new connection before closing the old one, so the old handler's
+    # cleanup can't remove it
+    previous = active_connections.get(session_id)
+    client_id = str(uuid.uuid4())
+    active_connections[session_id] = {
+        "websocket": websocket,
+        "client_id": client_id
+    }
+    await session_store.set_connected(session_id, client_id)
+    
     # Close any existing connection for this session
-    if session_id in active_connections:
+    if previous:
         try:
-            await active_connections[session_id]["websocket"].close()
+            await previous["websocket"].close()
         except:
             pass
     
-    # Store new connection
-    active_connections[session_id] = {
-        "websocket": websocket,
-        "client_id": str(uuid.uuid4())
-    }
-    
     try:
         while True:
             # Just keep the connection alive but don't process messages here
             await websocket.receive_text()
     except WebSocketDisconnect:
-        # Clean up connection on disconnect
-        if session_id in active_connections:
-            del active_connections[session_id]
+        pass
     except Exception:
-        # Clean up on any other error
-        if session_id in active_connections:
-            del active_connections[session_id]
+        pass
+    finally:
+        # Clean up connection on disconnect or any other error
+        _drop_connection(session_id, websocket)
+        await session_store.clear_connected(session_id, client_id)
 
 @app.post("/api/chat/new")
 async def new_chat():
     """Start a new chat session"""
     session_id = str(uuid.uuid4())
     chat_sessions[session_id] = AgentManager(llm_provider=None, verbose=True)
+    await session_store.create_session(session_id)
     return {"session_id": session_id}
 
 @app.post("/api/chat/cancel/{session_id}")
 async def cancel_chat(session_id: str):
     """Cancel ongoing chat request"""
-    if session_id in active_requests and active_requests[session_id]:
-        agent = chat_sessions.get(session_id)
-        if agent and agent.llm_provider:
-            agent.llm_provider.cancel_request()
-        active_requests[session_id] = None
+    if not _cancel_local_request(session_id):
+        # The request may be running in another worker
+        await session_store.publish_cancel(session_id)
     return {"status": "success"}
 
+async def _fetch_models(provider: str) -> Any:
+    """Fetch the model list from a provider's API"""
+    if provider == "ollama":
+        # Get models from Ollama API
+        response = await _http.get("http://localhost:11434/api/tags")
+        if response.is_success:
+            models = response.json()
+            return [{"id": model["name"], "name": model["name"]} for model in models["models"]]
+    elif provider == "openai":
+        # Get models from OpenAI API
+        client = openai.AsyncOpenAI(api_key=get_settings().openai_api_key, http_client=_http)
+        models = await client.models.list()
+        return [{"id": model.id, "name": model.id} for model in models.data 
+                if model.id.startswith(("gpt-4", "gpt-3.5"))]
+    elif provider == "anthropic":
+        # Get models from Anthropic API using their client
+        api_key = get_settings().anthropic_api_key
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
+        
+        client = anthropic.AsyncAnthropic(api_key=api_key, http_client=_http)
+        response = await client.models.list(limit=100)
+        
+        models = []
+        for model in response.data:
+            models.append({
+                "id": model.id,
+                "name": model.display_name
+            })
+        
+        return models
+    elif provider == "deepseek":
+        # Static list for DeepSeek
+        return [
+            {"id": "deepseek-coder", "name": "DeepSeek Coder"},
+            {"id": "deepseek-chat", "name": "DeepSeek Chat"}
+        ]
+    else:
+        raise ValueError(f"Unsupported provider: {provider}")
+
 @app.get("/api/models/{provider}")
 async def get_models(provider: str):
     """Get available models for a provider"""
+    if provider in _models_cache:
+        return _models_cache[provider]
     try:
-        if provider == "ollama":
-            # Get models from Ollama API
-            response = requests.get("http://localhost:11434/api/tags")
-            if response.ok:
-                models = response.json()
-                return [{"id": model["name"], "name": model["name"]} for model in models["models"]]
-        elif provider == "openai":
-            # Get models from OpenAI API
-            client = openai.OpenAI()
-            models = client.models.list()
-            return [{"id": model.id, "name": model.id} for model in models.data 
-                    if model.id.startswith(("gpt-4", "gpt-3.5"))]
-        elif provider == "anthropic":
-            # Get models from Anthropic API using their client
-            api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not api_key:
-                raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
-            
-            client = anthropic.Anthropic(api_key=api_key)
-            response = client.models.list(limit=100)
-            
-            models = []
-            for model in response.data:
-                models.append({
-                    "id": model.id,
-                    "name": model.display_name
-                })
-            
-            return models
-        elif provider == "deepseek":
-            # Static list for DeepSeek
-            return [
-                {"id": "deepseek-coder", "name": "DeepSeek Coder"},
-                {"id": "deepseek-chat", "name": "DeepSeek Chat"}
-            ]
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        models = await _fetch_models(provider)
+        if models is not None:
+            _models_cache[provider] = models
+        return models
     except Exception as e:
         return {"error": str(e)}
 
+async def stream_response(
+    agent_manager: AgentManager,
+    request: str,
+    use_cache: bool,
+    provider: str,
+    message_id: str,
+    session_id: str
+) -> str:
+    """Run a request through the agent, stream the answer to the session and return it"""
+    response = await agent_manager.aprocess_request(request, stream=True, use_cache=use_cache)
+
+    # Handle response based on type
+    if hasattr(response, '__aiter__'):
+        # Streaming response: only new text is sent, as coalesced deltas
+        parts: List[str] = []
+        pending: List[str] = []
+        done = asyncio.Event()
+        flusher = asyncio.create_task(
+            flush_deltas(pending, f"assistant-{message_id}", session_id, done)
+        )
+        try:
+            with timed("agent_stream", provider):
+                async for chunk in response:
+                    if isinstance(chunk, str) and chunk:
+                        parts.append(chunk)
+                        pending.append(chunk)
+        finally:
+            # Let the flusher send whatever is still buffered
+            done.set()
+            await flusher
+
+        if parts:
+            await broadcast_message({
+                "type": "message_end",
+                "id": f"assistant-{message_id}"
+            }, session_id)
+        return "".join(parts)
+
+    # Non-streaming response (e.g., final_answer)
+    await broadcast_message({
+        "type": "message",
+        "content": {
+            "id": f"assistant-{message_id}",
+            "role": "assistant",
+            "content": str(response),
+            "is_streaming": False
+        }
+    }, session_id)
+    return str(response)
+
 @app.post("/api/chat")
 async def chat(message: Dict[str, Any], background_tasks: BackgroundTasks):
     """Process chat messages"""
     try:
         session_id = message.get("session_id")
-        if not session_id or session_id not in chat_sessions:
+        agent_manager = await get_session(session_id) if session_id else None
+        if agent_manager is None:
             return {"status": "error", "message": "Invalid session ID"}
 
-        # Check if we have an active WebSocket connection for this session
-        if session_id not in active_connections:
+        # Check if we have an active WebSocket connection for this session, in any worker
+        if session_id not in active_connections and not await session_store.is_connected(session_id):
             return {"status": "error", "message": "No active WebSocket connection"}
 
-        agent_manager = chat_sessions[session_id]
         message_id = str(uuid.uuid4())
+        request_id.set(message_id)
         
         # Get provider and model from request
         provider = message.get("provider")
@@ -174,80 +475,51 @@ async def chat(message: Dict[str, Any], background_tasks: BackgroundTasks):
         if not provider or not model:
             return {"status": "error", "message": "Provider and model must be selected"}
         
-        # Create appropriate provider
-        if provider == "ollama":
-            llm_provider = OllamaProvider(model_name=model)
-        elif provider == "openai":
-            llm_provider = OpenAIProvider(model_name=model)
-        elif provider == "anthropic":
-            llm_provider = AnthropicProvider(model_name=model)
-        elif provider == "deepseek":
-            llm_provider = DeepSeekProvider(model_name=model)
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
-        
-        # Update agent manager with new provider
-        agent_manager.llm_provider = llm_provider
-        
-        # Set thinking state
-        await broadcast_message({"type": "thinking", "value": True}, session_id)
+        # Update agent manager with the pooled provider
+        llm_provider = await get_provider(provider, model)
+        agent_manager.update_configuration(llm_provider=llm_provider)
+        await session_store.save_state(session_id, provider=provider, model=model)
         
-        # Send user message to chat only once
-        await broadcast_message({
-            "type": "message",
-            "content": {
-                "id": f"user-{message_id}",
-                "role": "user",
-                "content": message["message"]
-            }
-        }, session_id)
+        # Set thinking state and send user message to chat only once
+        await asyncio.gather(
+            broadcast_message({"type": "thinking", "value": True}, session_id),
+            broadcast_message({
+                "type": "message",
+                "content": {
+                    "id": f"user-{message_id}",
+                    "role": "user",
+                    "content": message["message"]
+                }
+            }, session_id)
+        )
         
         # Store active request
-        active_requests[session_id] = llm_provider
+        active_requests[session_id] = message_id
         
         try:
-            # Process request
-            response = agent_manager.process_request(message["message"], stream=True)
-            
-            # Handle response based on type
-            if hasattr(response, '__iter__') and not isinstance(response, str):
-                # Streaming response
-                full_response = ""
-                for chunk in response:
-                    if isinstance(chunk, str):
-                        full_response += chunk
-                        await broadcast_message({
+            with timed("chat", provider):
+                use_cache = message.get("use_cache", True)
+                run = lambda: stream_response(
+                    agent_manager, message["message"], use_cache, provider, message_id, session_id
+                )
+                if use_cache:
+                    # If the same prompt is already running, its answer is sent to this session
+                    # instead of running the agent again
+                    await single_flight(
+                        agent_manager.cache_key(message["message"]),
+                        run,
+                        on_shared=lambda answer: broadcast_message({
                             "type": "message",
                             "content": {
                                 "id": f"assistant-{message_id}",
                                 "role": "assistant",
-                                "content": full_response,
-                                "is_streaming": True
+                                "content": answer,
+                                "is_streaming": False
                             }
                         }, session_id)
-                
-                # Send final streaming message
-                if full_response:
-                    await broadcast_message({
-                        "type": "message",
-                        "content": {
-                            "id": f"assistant-{message_id}",
-                            "role": "assistant",
-                            "content": full_response,
-                            "is_streaming": False
-                        }
-                    }, session_id)
-            else:
-                # Non-streaming response (e.g., final_answer)
-                await broadcast_message({
-                    "type": "message",
-                    "content": {
-                        "id": f"assistant-{message_id}",
-                        "role": "assistant",
-                        "content": str(response),
-                        "is_streaming": False
-                    }
-                }, session_id)
+                    )
+                else:
+                    await run()
         finally:
             # Clear active request
             active_requests[session_id] = None
@@ -273,16 +545,12 @@ async def chat(message: Dict[str, Any], background_tasks: BackgroundTasks):
 @app.get("/api/tools")
 async def get_tools():
     """Get available tools"""
-    # Create a temporary agent manager without a provider
-    temp_agent = AgentManager(llm_provider=None)
-    return temp_agent.get_available_tools()
+    return TOOL_METADATA
 
 @app.get("/api/status")
 async def get_status():
     """Get agent status"""
-    # Create a temporary agent manager without a provider
-    temp_agent = AgentManager(llm_provider=None)
-    return temp_agent.get_agent_status()
+    return get_introspection_agent().get_agent_status()
 
 @app.post("/api/provider")
 async def update_provider(data: Dict[str, str]):
@@ -295,8 +563,7 @@ async def update_provider(data: Dict[str, str]):
     else:
         return {"status": "error", "message": "Unsupported provider"}
     
-    temp_agent = AgentManager(llm_provider=OpenAIProvider())
-    temp_agent.update_configuration(llm_provider=llm_provider)
+    get_introspection_agent().update_configuration(llm_provider=llm_provider)
     return {"status": "success"}
 
 @app.post("/api/chat/clear")
@@ -321,13 +588,17 @@ async def generate_image(request: Dict[str, Any]):
             raise ValueError(f"Invalid size. Supported sizes are: {', '.join(valid_sizes)}")
         
         if provider == "openai":
-            client = openai.OpenAI()
-            response = client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size=size,
-                quality="standard",
-                n=1,
+            client = openai.AsyncOpenAI(api_key=get_settings().openai_api_key)
+            # Identical prompts fired together (e.g. a double click) share one generation
+            response = await single_flight(
+                f"image|dall-e-3|{size}|{prompt}",
+                lambda: client.images.generate(
+                    model="dall-e-3",
+                    prompt=prompt,
+                    size=size,
+                    quality="standard",
+                    n=1,
+                )
             )
             return {"url": response.data[0].url}
         else:
@@ -354,43 +625,66 @@ async def web_search(request: Dict[str, Any]):
 async def create_artifact(file: UploadFile):
     """Create a new artifact from uploaded file"""
     try:
+        # Reject names that could escape the artifacts directory
+        filename = file.filename or ""
+        if PurePosixPath(filename).name != filename or filename in ("", ".", ".."):
+            raise ValueError(f"Invalid file name: {filename}")
+
         # Create artifacts directory if it doesn't exist
         os.makedirs("artifacts", exist_ok=True)
         
-        # Save file
-        file_path = f"artifacts/{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Save file chunk by chunk so memory stays bounded
+        file_path = f"artifacts/{filename}"
+        async with aiofiles.open(file_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await f.write(chunk)
             
         # Return file URL
         return {
             "status": "success",
-            "url": f"/artifacts/{file.filename}",
-            "name": file.filename
+            "url": f"/artifacts/{filename}",
+            "name": filename
         }
     except Exception as e:
         return {"error": str(e)}
 
+# Artifact listing, reused while the directory's mtime is unchanged
+_artifacts_cache: Dict[str, Any] = {"mtime": None, "artifacts": []}
+
+def _scan_artifacts() -> List[Dict[str, str]]:
+    """List the artifacts directory, skipping the walk when it hasn't changed"""
+    os.makedirs("artifacts", exist_ok=True)
+    mtime = os.stat("artifacts").st_mtime_ns
+    if mtime != _artifacts_cache["mtime"]:
+        with os.scandir("artifacts") as entries:
+            artifacts = [
+                {"name": entry.name, "url": f"/artifacts/{entry.name}"}
+                for entry in entries if entry.is_file()
+            ]
+        _artifacts_cache.update(mtime=mtime, artifacts=artifacts)
+    return _artifacts_cache["artifacts"]
+
 @app.get("/api/artifacts/list")
 async def list_artifacts():
     """List available artifacts"""
     try:
-        # Create artifacts directory if it doesn't exist
-        os.makedirs("artifacts", exist_ok=True)
-        
-        # List files in artifacts directory
-        files = os.listdir("artifacts")
-        artifacts = []
-        for file in files:
-            artifacts.append({
-                "name": file,
-                "url": f"/artifacts/{file}"
-            })
+        artifacts = await asyncio.to_thread(_scan_artifacts)
         return {"artifacts": artifacts}
     except Exception as e:
         return {"error": str(e)}
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    # Multiple workers need REDIS_URL so sessions and messages are shared between
+    # them; auto-reload is for development only
+    uvicorn.run(
+        "src.app:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        ws="websockets",
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
+        reload=os.getenv("UVICORN_RELOAD", "").lower() in ("1", "true")
+    )
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Set
+from cachetools import TTLCache
+from .llm import LLMProvider
+from .metrics import request_id, timed
+
+logger = logging.getLogger("batcher")
+
+# How long a cancelled request keeps failing new calls, so an agent run that is
+# still stepping can't start more model calls after its chat was cancelled
+CANCELLED_TTL = 3600
+
+
+def _estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Rough token count for a conversation (~4 characters per token)"""
+    return sum(len(str(msg.get("content", ""))) for msg in messages) // 4
+
+
+class RequestBatcher:
+    """Coalesces LLM calls arriving within a short window into batched provider calls"""
+
+    def __init__(self, batch_window: float = 0.01, max_num_batch_tokens: int = 8192):
+        self.batch_window = batch_window
+        self.max_num_batch_tokens = max_num_batch_tokens
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Callers' futures per request id, so cancelling a chat resolves its pending calls
+        self._pending: Dict[str, Set[asyncio.Future]] = {}
+        self._cancelled = TTLCache(maxsize=1024, ttl=CANCELLED_TTL)
+
+    @property
+    def is_running(self) -> bool:
+        """Check if the batch loop is accepting requests"""
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the batch loop on the running event loop"""
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = self.loop.create_task(self.batch_loop())
+        logger.info("Batcher started (window=%.0f ms)", self.batch_window * 1000)
+
+    async def stop(self) -> None:
+        """Stop the batch loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self,
+                     llm_provider: LLMProvider,
+                     messages: List[Dict[str, str]],
+                     stop_sequences: Optional[List[str]] = None,
+                     **kwargs) -> str:
+        """Queue a call and wait for its share of the batched result"""
+        request = request_id.get()
+        if request in self._cancelled:
+            raise asyncio.CancelledError(f"Request {request} was cancelled")
+        future = self.loop.create_future()
+        pending = self._pending.setdefault(request, set())
+        pending.add(future)
+        try:
+            await self._queue.put((llm_provider, messages, stop_sequences, kwargs, future))
+            return await future
+        finally:
+            pending.discard(future)
+            if not pending and self._pending.get(request) is pending:
+                del self._pending[request]
+
+    def cancel(self, request: str) -> None:
+        """Cancel a request's pending calls and fail any it submits afterwards"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._cancel, request)
+
+    def _cancel(self, request: str) -> None:
+        self._cancelled[request] = True
+        for future in list(self._pending.get(request, ())):
+            future.cancel()
+
+    async def batch_loop(self) -> None:
+        """Drain the queue every batch window and dispatch one call per compatible group"""
+        while True:
+            batch = [await self._queue.get()]
+            num_tokens = _estimate_tokens(batch[0][1])
+            deadline = self.loop.time() + self.batch_window
+
+            while num_tokens < self.max_num_batch_tokens:
+                timeout = deadline - self.loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                num_tokens += _estimate_tokens(item[1])
+
+            # Only calls for the same model and sampling settings can share a provider call
+            groups: Dict[Any, List[tuple]] = {}
+            for item in batch:
+                llm_provider, _, stop_sequences, kwargs, _ = item
+                key = (
+                    type(llm_provider),
+                    getattr(llm_provider, "model_name", None),
+                    tuple(stop_sequences or []),
+                    repr(sorted(kwargs.items()))
+                )
+                groups.setdefault(key, []).append(item)
+
+            for items in groups.values():
+                self.loop.create_task(self._dispatch(items))
+
+    async def _dispatch(self, items: List[tuple]) -> None:
+        """Run one batched provider call and hand each caller its own result or error"""
+        # Calls cancelled while they were queued are not sent
+        items = [item for item in items if not item[4].done()]
+        if not items:
+            return
+        llm_provider, _, stop_sequences, kwargs, _ = items[0]
+        logger.info("Dispatching batch of %d to %s", len(items), type(llm_provider).__name__)
+        try:
+            results = await llm_provider.abatch(
+                [item[1] for item in items],
+                stop_sequences,
+                **kwargs
+            )
+        except Exception as e:
+            if len(items) == 1:
+                results = [e]
+            else:
+                # One bad request must not fail the sessions it was batched with, so a
+                # failed batch is retried call by call
+                results = await asyncio.gather(*[
+                    llm_provider.acall(item[1], stop_sequences=stop_sequences, **kwargs)
+                    for item in items
+                ], return_exceptions=True)
+
+        for item, result in zip(items, results):
+            future = item[4]
+            if future.done():
+                continue
+            if isinstance(result, asyncio.CancelledError):
+                future.cancel()
+            elif isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class BatchedProvider(LLMProvider):
+    """Routes an agent's model calls through the shared batcher"""
+
+    # Longest a worker thread waits on a batched call: a provider request times out after
+    # 60 s, and this leaves room for its retries, so only a stuck batch loop hits it
+    CALL_TIMEOUT = 600
+
+    def __init__(self, llm_provider: LLMProvider, batcher: RequestBatcher):
+        self.llm_provider = llm_provider
+        self.batcher = batcher
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return getattr(self.llm_provider, "model_name", None)
+
+    def _can_batch(self) -> bool:
+        """Batching blocks the caller, so it is only used from worker threads"""
+        if not self.batcher.is_running:
+            return False
+        try:
+            asyncio.get_running_loop()
+            return False
+        except RuntimeError:
+            return True
+
+    def __call__(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
+        """Make the provider callable for compatibility with smolagents"""
+        with timed("provider", type(self.llm_provider).__name__):
+            if not self._can_batch():
+                return self.llm_provider(messages, stop_sequences=stop_sequences, **kwargs)
+            future = asyncio.run_coroutine_threadsafe(
+                self.batcher.submit(self.llm_provider, messages, stop_sequences, **kwargs),
+                self.batcher.loop
+            )
+            try:
+                return future.result(timeout=self.CALL_TIMEOUT)
+            except TimeoutError:
+                future.cancel()
+                raise
+
+    def generate_response(self,
+                         messages: List[Dict[str, str]],
+                         system_prompt: Optional[str] = None,
+                         stream: bool = False,
+                         **kwargs) -> Any:
+        return self.llm_provider.generate_response(messages, system_prompt=system_prompt, stream=stream, **kwargs)
+
+    def get_tool_call(self,
+                      messages: List[Dict[str, str]],
+                      available_tools: List[Any],
+                      stop_sequences: List[str],
+                      **kwargs) -> Any:
+        return self.llm_provider.get_tool_call(messages, available_tools, stop_sequences, **kwargs)
+
+    async def acall(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
+        """Async variant of __call__, batched when running on the batcher's loop"""
+        with timed("provider", type(self.llm_provider).__name__):
+            if self.batcher.is_running and asyncio.get_running_loop() is self.batcher.loop:
+                return await self.batcher.submit(self.llm_provider, messages, stop_sequences, **kwargs)
+            return await self.llm_provider.acall(messages, stop_sequences=stop_sequences, **kwargs)
+
+    async def abatch(self,
+                     batch: List[List[Dict[str, str]]],
+                     stop_sequences: Optional[List[str]] = None,
+                     **kwargs) -> List[str]:
+        return await self.llm_provider.abatch(batch, stop_sequences, **kwargs)
+
+    async def acancel(self):
+        await self.llm_provider.acancel()
+
+    def cancel_request(self, request: Optional[str] = None):
+        # Agent calls are not streamed, so they are waiting in the batcher rather than on a response
+        if request is not None:
+            self.batcher.cancel(request)
+        self.llm_provider.cancel_request(request)
@@ -1,14 +1,151 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional, Any
-import openai
-from anthropic import Anthropic
-import requests
+from typing import List, Dict, Iterator, Optional, Any, Tuple
+from types import MappingProxyType
+import asyncio
+import functools
+import inspect
+import httpx
+from httpx_sse import EventSource
 import json
+import logging
+import orjson
 import os
+import sys
+import threading
+import time
+import weakref
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 from dotenv import load_dotenv
+from . import llm_cache
+from .metrics import request_id
 
 load_dotenv()
 
+logger = logging.getLogger("llm")
+
+_HTTP_OPTIONS = dict(
+    http2=True,
+    timeout=httpx.Timeout(60.0),
+    limits=httpx.Limits(max_keepalive_connections=32)
+)
+
+def _http_client() -> httpx.Client:
+    """Pooled HTTP client for providers that call their API directly"""
+    return httpx.Client(**_HTTP_OPTIONS)
+
+def _async_http_client() -> httpx.AsyncClient:
+    """Pooled async HTTP client for providers that call their API directly"""
+    return httpx.AsyncClient(**_HTTP_OPTIONS)
+
+# Upper bound on concurrent requests each provider sends to its API
+MAX_CONCURRENT_REQUESTS = 32
+
+# Retryable SDK errors, by name. The SDKs are imported lazily by their providers,
+# so an SDK that was never imported cannot have raised the error.
+_TRANSIENT_SDK_ERRORS = ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError")
+
+def _is_transient(error: BaseException) -> bool:
+    """Whether a failed request is worth retrying"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    if isinstance(error, httpx.TimeoutException):
+        return True
+    for sdk_name in ("openai", "anthropic"):
+        sdk = sys.modules.get(sdk_name)
+        if sdk and isinstance(error, tuple(getattr(sdk, name) for name in _TRANSIENT_SDK_ERRORS)):
+            return True
+    return False
+
+_retry_transient = retry(
+    retry=retry_if_exception(_is_transient),
+    wait=wait_random_exponential(min=1, max=60),
+    stop=stop_after_attempt(6),
+    reraise=True
+)
+
+def rate_limited(method):
+    """Bound concurrent requests per provider and retry transient failures with backoff"""
+    # The slot is held only for the attempt itself, not while backing off
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            async with self._async_slots:
+                return await method(self, *args, **kwargs)
+
+        return _retry_transient(async_wrapper)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._slots:
+            return method(self, *args, **kwargs)
+
+    return _retry_transient(wrapper)
+
+def cached_response(method):
+    """Serve repeated identical greedy (temperature 0) completions from the response cache"""
+    signature = inspect.signature(method)
+
+    def cache_key(self, args, kwargs) -> Optional[str]:
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        request = dict(bound.arguments)
+        del request["self"]
+        extra = request.get("kwargs", {})
+        # Streams can't be replayed and sampled completions are meant to vary. Providers
+        # sample by default, so only calls that explicitly ask for temperature 0 are cached.
+        if request.get("stream") or extra.get("temperature") != 0:
+            return None
+        return llm_cache.make_request_key(type(self).__name__, getattr(self, "model_name", None), request)
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            key = cache_key(self, args, kwargs)
+            cached = llm_cache.get(key) if key else None
+            if cached is not None:
+                return cached
+            response = await method(self, *args, **kwargs)
+            if key and isinstance(response, str):
+                llm_cache.put(key, response)
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = cache_key(self, args, kwargs)
+        cached = llm_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+        response = method(self, *args, **kwargs)
+        if key and isinstance(response, str):
+            llm_cache.put(key, response)
+        return response
+
+    return wrapper
+
+# Speaker prefix for each message role in plain-text prompts
+_ROLE_TEMPLATE = {
+    "system": "System: ",
+    "user": "Human: ",
+    "assistant": "Assistant: ",
+    "function": "Tool Response: ",
+    "tool-response": "Tool Response: ",
+    "tool": "Tool Call: "
+}
+
+def _messages_to_prompt(messages: List[Dict[str, str]]) -> str:
+    """Render chat messages as a plain-text prompt"""
+    return "\n\n".join(
+        f"{_ROLE_TEMPLATE[msg['role']]}{msg['content']}"
+        for msg in messages
+        if msg["role"] in _ROLE_TEMPLATE
+    ).strip()
+
+# Guards each provider's open streaming responses, which calls on different
+# threads add to concurrently
+_active_requests_lock = threading.Lock()
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
     
@@ -35,9 +172,99 @@ class LLMProvider(ABC):
         """Generate a tool call from the LLM"""
         pass
 
-    def cancel_request(self):
-        """Cancel any ongoing request"""
-        pass
+    async def acall(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
+        """Async variant of __call__; providers with an async client override this"""
+        return await asyncio.to_thread(self, messages, stop_sequences=stop_sequences, **kwargs)
+
+    async def abatch(self,
+                     batch: List[List[Dict[str, str]]],
+                     stop_sequences: Optional[List[str]] = None,
+                     **kwargs) -> List[str]:
+        """Generate responses for several conversations concurrently
+
+        A conversation whose call fails gets its exception in place of a response, so the
+        others still complete.
+        """
+        tasks = vars(self).setdefault("_async_tasks", set())
+        batch_tasks = [
+            asyncio.ensure_future(self.acall(messages, stop_sequences=stop_sequences, **kwargs))
+            for messages in batch
+        ]
+        tasks.update(batch_tasks)
+        try:
+            return list(await asyncio.gather(*batch_tasks, return_exceptions=True))
+        finally:
+            tasks.difference_update(batch_tasks)
+
+    async def acancel(self):
+        """Cancel in-flight async calls started by abatch"""
+        for task in list(vars(self).get("_async_tasks", ())):
+            task.cancel()
+
+    def cancel_request(self, request: Optional[str] = None):
+        """Cancel a request by closing its responses still streaming; without a request id, cancel all of them"""
+        # Pooled providers serve many sessions, so cancelling one request must leave the others streaming
+        with _active_requests_lock:
+            active = vars(self).get("_active_requests", {})
+            if request is None:
+                handles = [handle for handles in active.values() for handle in handles]
+            else:
+                handles = list(active.pop(request, ()))
+        for handle in handles:
+            handle.close()
+
+    def _track_request(self, handle: Any) -> Any:
+        """Register a streaming response under the current request id so cancel_request can close it"""
+        with _active_requests_lock:
+            active = vars(self).setdefault("_active_requests", {})
+            # Forget requests whose responses have all been released or collected
+            for key in [key for key, handles in active.items() if not handles]:
+                del active[key]
+            active.setdefault(request_id.get(), weakref.WeakSet()).add(handle)
+        return handle
+
+    def _release_request(self, handle: Any) -> None:
+        """Forget a streaming response once it has been consumed"""
+        with _active_requests_lock:
+            for handles in vars(self).get("_active_requests", {}).values():
+                handles.discard(handle)
+
+    @staticmethod
+    def _split_system(messages: List[Dict[str, str]]) -> Tuple[str, List[Dict[str, str]]]:
+        """Separate the system prompt from the rest of the conversation"""
+        system = "\n\n".join(msg["content"] for msg in messages if msg["role"] == "system")
+        return system, [msg for msg in messages if msg["role"] != "system"]
+
+# Message roles mapped to OpenAI-supported roles; tool turns are simplified to assistant messages
+_ROLE_MAPPING = MappingProxyType({
+    'human': 'user',
+    'assistant': 'assistant',
+    'system': 'system',
+    'tool': 'assistant',
+    'tool-response': 'assistant'
+})
+
+def _to_openai_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Map a conversation onto OpenAI-supported roles"""
+    return [
+        {
+            'role': _ROLE_MAPPING.get(msg.get('role', ''), msg.get('role', '')),
+            'content': msg.get('content', '')
+        }
+        for msg in messages
+    ]
+
+def _function_schema(tool: Any) -> Dict[str, Any]:
+    """Function-calling schema for a tool"""
+    return {
+        "name": tool.name,
+        "description": tool.description,
+        "parameters": {
+            "type": "object",
+            "properties": tool.inputs,
+            "required": list(tool.inputs.keys())
+        }
+    }
 
 class OpenAIProvider(LLMProvider):
     """OpenAI LLM provider implementation"""
@@ -46,72 +273,116 @@ class OpenAIProvider(LLMProvider):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key not provided")
-        self.client = openai.OpenAI(api_key=self.api_key)
+        import openai
+        self._openai = openai
+        # Retries are handled by rate_limited, so the SDK's own are turned off
+        self.client = openai.OpenAI(api_key=self.api_key, max_retries=0)
+        self.aclient = openai.AsyncOpenAI(api_key=self.api_key, max_retries=0)
         self.model_name = model_name
-        self._current_request = None
-
-    def cancel_request(self):
-        """Cancel any ongoing request"""
-        if self._current_request:
-            self._current_request.close()
-            self._current_request = None
-
-    def _map_role_to_openai(self, message: Dict[str, str]) -> Dict[str, str]:
-        """Map message roles to OpenAI-supported roles"""
-        role_mapping = {
-            'human': 'user',
-            'assistant': 'assistant',
-            'system': 'system',
-            'tool': 'assistant',  # Simplify tool responses as assistant messages
-            'tool-response': 'assistant'  # Simplify tool responses as assistant messages
-        }
-        
-        mapped_message = {
-            'role': role_mapping.get(message.get('role', ''), message.get('role', '')),
-            'content': message.get('content', '')
-        }
-        
-        # Log the role mapping for debugging
-        print(f"Mapped role {message.get('role')} to {mapped_message['role']}")
-        
-        return mapped_message
+        self._tools_schema_cache: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        self._slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        self._async_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
     def _handle_api_error(self, error: Exception, context: str) -> str:
         """Centralized error handling with detailed logging"""
         error_msg = f"OpenAI API Error in {context}: {str(error)}"
-        print(error_msg)  # Log error for debugging
+        logger.error(error_msg)
         
-        if "invalid_request_error" in str(error).lower():
+        if isinstance(error, self._openai.BadRequestError):
             return "I encountered an issue with the request format. Let me try a different approach."
-        elif "rate_limit_error" in str(error).lower():
+        elif isinstance(error, self._openai.RateLimitError):
             return "I'm receiving too many requests at the moment. Please try again in a moment."
         else:
             return f"I encountered an error: {str(error)}. Let me try a different approach."
 
+    @rate_limited
     def _make_api_call(self, messages: List[Dict[str, str]], **kwargs) -> Any:
         """Centralized API call handling"""
-        try:
-            # Map and log messages
-            mapped_messages = [self._map_role_to_openai(msg) for msg in messages]
-            print(f"Making API call with {len(mapped_messages)} messages")
-            
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=mapped_messages,
-                **kwargs
-            )
-            return response
-        except Exception as e:
-            raise e  # Re-raise for specific handling in calling methods
+        mapped_messages = _to_openai_messages(messages)
+        logger.debug("Making API call with %d messages", len(mapped_messages))
+        
+        return self.client.chat.completions.create(
+            model=self.model_name,
+            messages=mapped_messages,
+            **kwargs
+        )
+
+    @cached_response
+    def _complete(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Request a completion and return its text"""
+        response = self._make_api_call(messages, **kwargs)
+        return response.choices[0].message.content
+
+    @cached_response
+    @rate_limited
+    async def _acomplete(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Request a completion asynchronously and return its text"""
+        response = await self.aclient.chat.completions.create(
+            model=self.model_name,
+            messages=_to_openai_messages(messages),
+            **kwargs
+        )
+        return response.choices[0].message.content
 
     def __call__(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
         """Make the provider callable for compatibility with smolagents"""
         try:
-            response = self._make_api_call(messages, stop=stop_sequences, **kwargs)
-            return response.choices[0].message.content
+            return self._complete(messages, stop=stop_sequences, **kwargs)
         except Exception as e:
             return self._handle_api_error(e, "call")
 
+    async def acall(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
+        """Async variant of __call__"""
+        try:
+            return await self._acomplete(messages, stop=stop_sequences, **kwargs)
+        except Exception as e:
+            return self._handle_api_error(e, "acall")
+
+    def submit_batch(self,
+                     batch: List[List[Dict[str, str]]],
+                     poll_interval: float = 30.0,
+                     **kwargs) -> List[Optional[str]]:
+        """Run conversations through the Batch API and wait for the results (slower, half price)"""
+        lines = [
+            json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model_name,
+                    "messages": _to_openai_messages(messages),
+                    **kwargs
+                }
+            })
+            for i, messages in enumerate(batch)
+        ]
+        input_file = self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode()),
+            purpose="batch"
+        )
+        job = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        while job.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(poll_interval)
+            job = self.client.batches.retrieve(job.id)
+        if job.status != "completed":
+            raise RuntimeError(f"OpenAI batch {job.id} ended with status {job.status}")
+
+        # Results come back in any order; requests that failed are left as None
+        results: List[Optional[str]] = [None] * len(batch)
+        output = self.client.files.content(job.output_file_id).text
+        for line in output.splitlines():
+            if not line:
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") == 200:
+                results[int(result["custom_id"])] = response["body"]["choices"][0]["message"]["content"]
+        return results
+
     def generate_response(self,
                          messages: List[Dict[str, str]],
                          system_prompt: Optional[str] = None,
@@ -121,11 +392,9 @@ class OpenAIProvider(LLMProvider):
             if system_prompt:
                 messages = [{"role": "system", "content": system_prompt}] + messages
             
-            response = self._make_api_call(messages, stream=stream, **kwargs)
-            
             if stream:
-                return response
-            return response.choices[0].message.content
+                return self._track_request(self._make_api_call(messages, stream=True, **kwargs))
+            return self._complete(messages, **kwargs)
         except Exception as e:
             return self._handle_api_error(e, "generate_response")
 
@@ -135,22 +404,16 @@ class OpenAIProvider(LLMProvider):
                       stop_sequences: List[str],
                       **kwargs) -> Any:
         try:
-            # Format tools for OpenAI function calling
-            tools = [{
-                "type": "function",
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": {
-                        "type": "object",
-                        "properties": tool.inputs,
-                        "required": list(tool.inputs.keys())
-                    }
-                }
-            } for tool in available_tools]
+            # Format tools for OpenAI function calling, reusing the same list for the same toolset
+            key = tuple(tool.name for tool in available_tools)
+            tools = self._tools_schema_cache.get(key)
+            if tools is None:
+                tools = [{"type": "function", "function": _function_schema(tool)} for tool in available_tools]
+                self._tools_schema_cache[key] = tools
             
             # Log available tools for debugging
-            print(f"Available tools: {[t['function']['name'] for t in tools]}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Available tools: %s", [t['function']['name'] for t in tools])
             
             response = self._make_api_call(
                 messages,
@@ -162,11 +425,11 @@ class OpenAIProvider(LLMProvider):
             
             tool_calls = response.choices[0].message.tool_calls
             if tool_calls:
-                print(f"Selected tool: {tool_calls[0].function.name}")
+                logger.debug("Selected tool: %s", tool_calls[0].function.name)
             return tool_calls[0] if tool_calls else None
             
         except Exception as e:
-            print(self._handle_api_error(e, "get_tool_call"))
+            self._handle_api_error(e, "get_tool_call")
             return None
 
 class AnthropicProvider(LLMProvider):
@@ -176,28 +439,50 @@ class AnthropicProvider(LLMProvider):
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("Anthropic API key not provided")
-        self.client = Anthropic(api_key=self.api_key)
+        import anthropic
+        # Retries are handled by rate_limited, so the SDK's own are turned off
+        self.client = anthropic.Anthropic(api_key=self.api_key, max_retries=0)
+        self.aclient = anthropic.AsyncAnthropic(api_key=self.api_key, max_retries=0)
         self.model_name = model_name
-        self._current_request = None
-
-    def cancel_request(self):
-        if self._current_request:
-            self._current_request.close()
-            self._current_request = None
-
+        self._slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        self._async_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    def _request_args(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Build the system and message arguments for a request"""
+        system, rest = self._split_system(messages)
+        args = {"messages": [{"role": "user", "content": self._convert_messages_to_prompt(rest)}]}
+        if system:
+            # The agent's system prompt and tool descriptions are identical on every call,
+            # so mark them as a cacheable prefix
+            args["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        return args
+
+    @cached_response
+    @rate_limited
     def __call__(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
         """Make the provider callable for compatibility with smolagents"""
-        # Convert messages to Anthropic format
-        prompt = self._convert_messages_to_prompt(messages)
-        
         response = self.client.messages.create(
             model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
             stop_sequences=stop_sequences,
+            **self._request_args(messages),
+            **kwargs
+        )
+        return response.content[0].text
+
+    @cached_response
+    @rate_limited
+    async def acall(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
+        """Async variant of __call__"""
+        response = await self.aclient.messages.create(
+            model=self.model_name,
+            stop_sequences=stop_sequences,
+            **self._request_args(messages),
             **kwargs
         )
         return response.content[0].text
 
+    @cached_response
+    @rate_limited
     def generate_response(self,
                          messages: List[Dict[str, str]],
                          system_prompt: Optional[str] = None,
@@ -206,89 +491,153 @@ class AnthropicProvider(LLMProvider):
         if system_prompt:
             messages = [{"role": "system", "content": system_prompt}] + messages
             
-        # Convert messages to Anthropic format
-        prompt = self._convert_messages_to_prompt(messages)
-        
         response = self.client.messages.create(
             model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
             stream=stream,
+            **self._request_args(messages),
             **kwargs
         )
         
         if stream:
+            self._track_request(response)
             return (chunk.content[0].text for chunk in response)
         return response.content[0].text
 
+    @rate_limited
     def get_tool_call(self,
                       messages: List[Dict[str, str]],
                       available_tools: List[Any],
                       stop_sequences: List[str],
                       **kwargs) -> Any:
-        # Convert messages to Anthropic format
-        prompt = self._convert_messages_to_prompt(messages)
-        
         response = self.client.messages.create(
             model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
             stop_sequences=stop_sequences,
+            tools=self._tool_definitions(available_tools),
+            **self._request_args(messages),
             **kwargs
         )
-        return response.content[0].text
+        tool_calls = [block for block in response.content if block.type == "tool_use"]
+        return tool_calls[0] if tool_calls else response.content[0].text
+
+    def _tool_definitions(self, available_tools: List[Any]) -> List[Dict[str, Any]]:
+        """Anthropic tool definitions, marked as part of the cacheable prefix"""
+        tools = [{
+            "name": tool.name,
+            "description": tool.description,
+            "input_schema": {
+                "type": "object",
+                "properties": tool.inputs,
+                "required": list(tool.inputs.keys())
+            }
+        } for tool in available_tools]
+        # Tools come first in the prompt, so a breakpoint on the last one caches the whole block
+        if tools:
+            tools[-1]["cache_control"] = {"type": "ephemeral"}
+        return tools
 
     def _convert_messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
         """Convert chat messages to Anthropic prompt format"""
-        prompt = ""
-        for msg in messages:
-            role = msg["role"]
-            content = msg["content"]
-            
-            if role == "system":
-                prompt += f"System: {content}\n\n"
-            elif role == "user":
-                prompt += f"Human: {content}\n\n"
-            elif role == "assistant":
-                prompt += f"Assistant: {content}\n\n"
-            elif role in ["function", "tool-response"]:
-                prompt += f"Tool Response: {content}\n\n"
-            elif role == "tool":
-                prompt += f"Tool Call: {content}\n\n"
-                
-        return prompt.strip() 
+        return _messages_to_prompt(messages)
 
 class OllamaProvider(LLMProvider):
-    """Ollama LLM provider implementation"""
+    """Ollama LLM provider implementation
+
+    Defaults to a 4-bit (q4_K_M) build, which decodes several times faster than the
+    full-precision weights at a small quality cost. q5_K_M and q8_0 tags trade some of
+    that speed back for fidelity. num_ctx and num_predict bound the context window and
+    the reply length; num_thread and num_gpu are left to Ollama unless given.
+    """
     
-    def __init__(self, model_name: str = "qwen2.5-plus"):
+    # Keep the model loaded between calls so its KV cache for the shared prefix stays warm
+    keep_alive = -1
+
+    def __init__(self,
+                 model_name: str = "qwen2.5-plus:q4_K_M",
+                 num_ctx: int = 4096,
+                 num_predict: int = 512,
+                 num_thread: Optional[int] = None,
+                 num_gpu: Optional[int] = None):
         self.model_name = model_name
+        self.num_ctx = num_ctx
+        self.num_predict = num_predict
+        self.num_thread = num_thread
+        self.num_gpu = num_gpu
         self.base_url = "http://localhost:11434"
-        self._current_request = None
-
-    def cancel_request(self):
-        if self._current_request:
-            self._current_request.close()
-            self._current_request = None
+        self._http = _http_client()
+        self._ahttp = _async_http_client()
+        self._slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        self._async_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    def close(self):
+        """Close pooled connections"""
+        self._http.close()
+
+    async def aclose(self):
+        """Close pooled connections, including the async client's"""
+        self._http.close()
+        await self._ahttp.aclose()
+
+    def _options(self, stop_sequences: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Model options sent with every request"""
+        options = {
+            "num_ctx": self.num_ctx,
+            "num_predict": self.num_predict,
+            "num_thread": self.num_thread,
+            "num_gpu": self.num_gpu,
+            "stop": stop_sequences or []
+        }
+        return {key: value for key, value in options.items() if value is not None}
+
+    def _generate_payload(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]]) -> Dict[str, Any]:
+        """Request body for a non-streaming completion"""
+        # Send the system prompt separately so it forms an identical prefix across calls
+        system, rest = self._split_system(messages)
+        return {
+            "model": self.model_name,
+            "system": system,
+            "prompt": self._convert_messages_to_prompt(rest),
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": self._options(stop_sequences)
+        }
 
+    @cached_response
+    @rate_limited
     def __call__(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
         """Make the provider callable for compatibility with smolagents"""
-        # Convert messages to Ollama format
-        prompt = self._convert_messages_to_prompt(messages)
-        
-        # Make request to Ollama API
-        response = requests.post(
+        response = self._http.post(
             f"{self.base_url}/api/generate",
-            json={
-                "model": self.model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "stop": stop_sequences or []
-                }
-            }
+            json=self._generate_payload(messages, stop_sequences)
         )
         response.raise_for_status()
         return response.json()["response"]
 
+    @cached_response
+    @rate_limited
+    async def acall(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
+        """Async variant of __call__"""
+        response = await self._ahttp.post(
+            f"{self.base_url}/api/generate",
+            json=self._generate_payload(messages, stop_sequences)
+        )
+        response.raise_for_status()
+        return response.json()["response"]
+
+    async def abatch(self,
+                     batch: List[List[Dict[str, str]]],
+                     stop_sequences: Optional[List[str]] = None,
+                     **kwargs) -> List[str]:
+        """Generate responses for several conversations concurrently, grouped by system prompt"""
+        # Ollama has no batch endpoint, but it schedules concurrent requests for a loaded model
+        # into shared forward passes (up to OLLAMA_NUM_PARALLEL). Prompts sharing a system prompt
+        # are sent together so their common prefix can be reused from the KV cache.
+        order = sorted(range(len(batch)), key=lambda i: self._split_system(batch[i])[0])
+        responses = await super().abatch([batch[i] for i in order], stop_sequences, **kwargs)
+        by_index = dict(zip(order, responses))
+        return [by_index[i] for i in range(len(batch))]
+
+    @cached_response
+    @rate_limited
     def generate_response(self,
                          messages: List[Dict[str, str]],
                          system_prompt: Optional[str] = None,
@@ -300,44 +649,64 @@ class OllamaProvider(LLMProvider):
         # Convert messages to Ollama format
         prompt = self._convert_messages_to_prompt(messages)
         
+        payload = {"model": self.model_name, "prompt": prompt, "options": self._options()}
         if stream:
-            # Stream response
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": True
-                },
-                stream=True
-            )
-            response.raise_for_status()
-            
-            def generate():
-                for line in response.iter_lines():
-                    if line:
-                        chunk = json.loads(line)
-                        if chunk.get("response"):
-                            yield chunk["response"]
-            
-            return generate()
+            return self._stream_generate(payload)
         else:
             # Single response
-            response = requests.post(
+            response = self._http.post(
                 f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False
-                }
+                json={**payload, "stream": False}
             )
             response.raise_for_status()
             return response.json()["response"]
 
+    def _stream_generate(self, payload: Dict[str, Any]) -> Iterator[str]:
+        """Send a streaming generate request and yield the response text as it arrives"""
+        response = self._http.send(
+            self._http.build_request(
+                "POST",
+                f"{self.base_url}/api/generate",
+                json={**payload, "stream": True}
+            ),
+            stream=True
+        )
+        response.raise_for_status()
+        self._track_request(response)
+
+        def generate():
+            try:
+                for line in self._iter_ndjson_lines(response):
+                    chunk = orjson.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+            finally:
+                response.close()
+                self._release_request(response)
+
+        return generate()
+
+    @staticmethod
+    def _iter_ndjson_lines(response: httpx.Response) -> Iterator[bytes]:
+        """Yield the non-empty lines of a newline-delimited JSON body as raw bytes"""
+        # Splitting the raw bytes skips the text decode and line scanning of iter_lines;
+        # orjson parses the bytes directly
+        buffer = b""
+        for data in response.iter_bytes():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+
+    @rate_limited
     def get_tool_call(self,
                       messages: List[Dict[str, str]],
                       available_tools: List[Any],
                       stop_sequences: List[str],
+                      stream: bool = False,
                       **kwargs) -> Any:
         # Convert messages to Ollama format
         prompt = self._convert_messages_to_prompt(messages)
@@ -349,40 +718,25 @@ class OllamaProvider(LLMProvider):
             for tool in available_tools
         ])
         prompt = f"{prompt}\n\nAvailable tools:\n{tools_desc}\n\nPlease select a tool to use:"
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "options": self._options(stop_sequences)
+        }
+        if stream:
+            # Yield the selection as it is generated so callers can act on the tool name early
+            return self._stream_generate(payload)
         
-        response = requests.post(
+        response = self._http.post(
             f"{self.base_url}/api/generate",
-            json={
-                "model": self.model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "stop": stop_sequences
-                }
-            }
+            json={**payload, "stream": False}
         )
         response.raise_for_status()
         return response.json()["response"]
 
     def _convert_messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
         """Convert chat messages to Ollama prompt format"""
-        prompt = ""
-        for msg in messages:
-            role = msg["role"]
-            content = msg["content"]
-            
-            if role == "system":
-                prompt += f"System: {content}\n\n"
-            elif role == "user":
-                prompt += f"Human: {content}\n\n"
-            elif role == "assistant":
-                prompt += f"Assistant: {content}\n\n"
-            elif role in ["function", "tool-response"]:
-                prompt += f"Tool Response: {content}\n\n"
-            elif role == "tool":
-                prompt += f"Tool Call: {content}\n\n"
-                
-        return prompt.strip() 
+        return _messages_to_prompt(messages)
 
 class DeepSeekProvider(LLMProvider):
     """DeepSeek LLM provider implementation"""
@@ -393,16 +747,43 @@ class DeepSeekProvider(LLMProvider):
             raise ValueError("DeepSeek API key not provided")
         self.model_name = model_name
         self.base_url = "https://api.deepseek.com/v1"
-        self._current_request = None
-
-    def cancel_request(self):
-        if self._current_request:
-            self._current_request.close()
-            self._current_request = None
-
+        self._tools_schema_cache: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        self._http = _http_client()
+        self._ahttp = _async_http_client()
+        self._slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        self._async_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    def close(self):
+        """Close pooled connections"""
+        self._http.close()
+
+    async def aclose(self):
+        """Close pooled connections, including the async client's"""
+        self._http.close()
+        await self._ahttp.aclose()
+
+    @cached_response
+    @rate_limited
     def __call__(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
         """Make the provider callable for compatibility with smolagents"""
-        response = requests.post(
+        response = self._http.post(
+            f"{self.base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={
+                "model": self.model_name,
+                "messages": messages,
+                "stop": stop_sequences or [],
+                **kwargs
+            }
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    @cached_response
+    @rate_limited
+    async def acall(self, messages: List[Dict[str, str]], stop_sequences: Optional[List[str]] = None, **kwargs) -> str:
+        """Async variant of __call__"""
+        response = await self._ahttp.post(
             f"{self.base_url}/chat/completions",
             headers={"Authorization": f"Bearer {self.api_key}"},
             json={
@@ -415,6 +796,8 @@ class DeepSeekProvider(LLMProvider):
         response.raise_for_status()
         return response.json()["choices"][0]["message"]["content"]
 
+    @cached_response
+    @rate_limited
     def generate_response(self,
                          messages: List[Dict[str, str]],
                          system_prompt: Optional[str] = None,
@@ -423,56 +806,86 @@ class DeepSeekProvider(LLMProvider):
         if system_prompt:
             messages = [{"role": "system", "content": system_prompt}] + messages
 
-        self._current_request = requests.post(
-            f"{self.base_url}/chat/completions",
-            headers={"Authorization": f"Bearer {self.api_key}"},
-            json={
-                "model": self.model_name,
-                "messages": messages,
-                "stream": stream,
-                **kwargs
-            },
+        response = self._http.send(
+            self._http.build_request(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json={
+                    "model": self.model_name,
+                    "messages": messages,
+                    "stream": stream,
+                    **kwargs
+                }
+            ),
             stream=stream
         )
-        self._current_request.raise_for_status()
+        response.raise_for_status()
 
         if stream:
-            def generate():
-                for line in self._current_request.iter_lines():
-                    if line:
-                        data = json.loads(line.decode())
-                        if data.get("choices") and data["choices"][0].get("delta", {}).get("content"):
-                            yield data["choices"][0]["delta"]["content"]
-            return generate()
+            self._track_request(response)
+            deltas = self._stream_deltas(response)
+            return (delta["content"] for delta in deltas if delta.get("content"))
         else:
-            return self._current_request.json()["choices"][0]["message"]["content"]
+            return response.json()["choices"][0]["message"]["content"]
 
+    def _stream_deltas(self, response: httpx.Response) -> Iterator[Dict[str, Any]]:
+        """Yield the delta of each streamed completion chunk, closing the response when done"""
+        try:
+            # The stream is server-sent events; comments and keep-alives never surface as events
+            for event in EventSource(response).iter_sse():
+                if event.data == "[DONE]":
+                    break
+                if not event.data:
+                    continue
+                data = orjson.loads(event.data)
+                if data.get("choices"):
+                    yield data["choices"][0].get("delta", {})
+        finally:
+            response.close()
+            self._release_request(response)
+
+    @rate_limited
     def get_tool_call(self,
                       messages: List[Dict[str, str]],
                       available_tools: List[Any],
                       stop_sequences: List[str],
+                      stream: bool = False,
                       **kwargs) -> Any:
-        # Format tools for function calling
-        functions = [{
-            "name": tool.name,
-            "description": tool.description,
-            "parameters": {
-                "type": "object",
-                "properties": tool.inputs,
-                "required": list(tool.inputs.keys())
-            }
-        } for tool in available_tools]
+        # Format tools for function calling, reusing the same list for the same toolset
+        key = tuple(tool.name for tool in available_tools)
+        functions = self._tools_schema_cache.get(key)
+        if functions is None:
+            functions = [_function_schema(tool) for tool in available_tools]
+            self._tools_schema_cache[key] = functions
+
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "functions": functions,
+            "stop": stop_sequences,
+            **kwargs
+        }
+        if stream:
+            # Yield partial function_call deltas (name first, then argument fragments) as they arrive
+            response = self._http.send(
+                self._http.build_request(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    json={**payload, "stream": True}
+                ),
+                stream=True
+            )
+            response.raise_for_status()
+            self._track_request(response)
+            deltas = self._stream_deltas(response)
+            return (delta["function_call"] for delta in deltas if delta.get("function_call"))
 
-        response = requests.post(
+        response = self._http.post(
             f"{self.base_url}/chat/completions",
             headers={"Authorization": f"Bearer {self.api_key}"},
-            json={
-                "model": self.model_name,
-                "messages": messages,
-                "functions": functions,
-                "stop": stop_sequences,
-                **kwargs
-            }
+            json=payload
         )
         response.raise_for_status()
         return response.json()["choices"][0]["message"].get("function_call") 
\ No newline at end of file
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+from cachetools import TTLCache
+
+logger = logging.getLogger("llm_cache")
+
+CACHE_TTL = 3600
+
+# In-process cache, shared by all sessions in this worker
+_cache = TTLCache(maxsize=10_000, ttl=CACHE_TTL)
+_lock = threading.Lock()
+
+# Optional Redis backend so cached responses survive restarts and are shared across workers
+_redis = None
+if os.getenv("REDIS_URL"):
+    try:
+        import redis
+        _redis = redis.Redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed; using in-process cache")
+
+def make_key(provider: str, model: Optional[str], prompt: str, tool_names: List[str]) -> str:
+    """Build the cache key for a prompt sent to a given provider, model and toolset"""
+    normalized_prompt = " ".join(prompt.split())
+    raw = f"{provider}|{model}|{normalized_prompt}|{sorted(tool_names)}"
+    return hashlib.blake2b(raw.encode()).hexdigest()
+
+def make_request_key(provider: str, model: Optional[str], request: Dict[str, Any]) -> str:
+    """Build the cache key for a single provider call"""
+    raw = json.dumps([provider, model, request], sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode()).hexdigest()
+
+def get(key: str) -> Optional[str]:
+    """Return the cached response for a key, if any"""
+    with _lock:
+        value = _cache.get(key)
+    if value is None and _redis is not None:
+        try:
+            value = _redis.get(f"llm_cache:{key}")
+        except Exception as e:
+            logger.warning(f"Redis cache lookup failed: {str(e)}")
+        if value is not None:
+            with _lock:
+                _cache[key] = value
+    return value
+
+def put(key: str, value: str) -> None:
+    """Store a response under a key"""
+    with _lock:
+        _cache[key] = value
+    if _redis is not None:
+        try:
+            _redis.set(f"llm_cache:{key}", value, ex=CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Redis cache write failed: {str(e)}")
+
+def clear() -> None:
+    """Drop all in-process entries"""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,31 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Histogram
+
+# Latency per stage of a chat request, so slow requests can be attributed to
+# agent reasoning, the provider call or WebSocket delivery
+STAGE_SECONDS = Histogram(
+    "chat_stage_seconds",
+    "Time spent in each stage of a chat request",
+    labelnames=["stage", "provider"]
+)
+
+# Id of the chat request being handled, for correlating log lines
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+@contextmanager
+def timed(stage: str, provider: str = ""):
+    """Record how long the wrapped block takes under the given stage"""
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage, provider=provider).observe((time.perf_counter_ns() - start) / 1e9)
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id to log records"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
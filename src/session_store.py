@@ -0,0 +1,99 @@
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger("session_store")
+
+# Sessions idle for longer than this are forgotten
+SESSION_TTL = 24 * 3600
+
+_SESSION_KEY = "agentx:session:{}"
+_CONNECTION_KEY = "agentx:connection:{}"
+_MESSAGE_PREFIX = "agentx:message:"
+_CANCEL_PREFIX = "agentx:cancel:"
+
+# Optional Redis backend that shares sessions between workers. Without it, sessions
+# only exist in the worker that created them.
+_redis = None
+if os.getenv("REDIS_URL"):
+    try:
+        import redis.asyncio as aioredis
+        _redis = aioredis.Redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed; sessions stay in-process")
+
+def enabled() -> bool:
+    """Whether sessions are shared through Redis"""
+    return _redis is not None
+
+async def create_session(session_id: str) -> None:
+    """Record a new session"""
+    if _redis is None:
+        return
+    key = _SESSION_KEY.format(session_id)
+    await _redis.hset(key, mapping={"created": "1"})
+    await _redis.expire(key, SESSION_TTL)
+
+async def get_state(session_id: str) -> Optional[Dict[str, str]]:
+    """Return a session's stored state, or None if the session is unknown"""
+    if _redis is None:
+        return None
+    state = await _redis.hgetall(_SESSION_KEY.format(session_id))
+    return state or None
+
+async def save_state(session_id: str, **state: str) -> None:
+    """Update a session's stored state and refresh its expiry"""
+    if _redis is None:
+        return
+    key = _SESSION_KEY.format(session_id)
+    await _redis.hset(key, mapping=state)
+    await _redis.expire(key, SESSION_TTL)
+
+async def set_connected(session_id: str, client_id: str) -> None:
+    """Record which client currently holds the session's WebSocket"""
+    if _redis is None:
+        return
+    await _redis.set(_CONNECTION_KEY.format(session_id), client_id, ex=SESSION_TTL)
+
+async def clear_connected(session_id: str, client_id: str) -> None:
+    """Forget the session's WebSocket, unless another client has taken it over"""
+    if _redis is None:
+        return
+    key = _CONNECTION_KEY.format(session_id)
+    if await _redis.get(key) == client_id:
+        await _redis.delete(key)
+
+async def is_connected(session_id: str) -> bool:
+    """Whether any worker holds a WebSocket for the session"""
+    if _redis is None:
+        return False
+    return bool(await _redis.exists(_CONNECTION_KEY.format(session_id)))
+
+async def publish_message(session_id: str, payload: str) -> None:
+    """Hand a message to whichever worker holds the session's WebSocket"""
+    if _redis is not None:
+        await _redis.publish(_MESSAGE_PREFIX + session_id, payload)
+
+async def publish_cancel(session_id: str) -> None:
+    """Ask whichever worker runs the session's request to cancel it"""
+    if _redis is not None:
+        await _redis.publish(_CANCEL_PREFIX + session_id, "")
+
+async def listen(
+    on_message: Callable[[str, str], Awaitable[Any]],
+    on_cancel: Callable[[str], Any]
+) -> None:
+    """Dispatch messages and cancellations published by other workers"""
+    pubsub = _redis.pubsub()
+    await pubsub.psubscribe(_MESSAGE_PREFIX + "*", _CANCEL_PREFIX + "*")
+    try:
+        async for event in pubsub.listen():
+            if event["type"] != "pmessage":
+                continue
+            channel = event["channel"]
+            if channel.startswith(_MESSAGE_PREFIX):
+                await on_message(channel[len(_MESSAGE_PREFIX):], event["data"])
+            else:
+                on_cancel(channel[len(_CANCEL_PREFIX):])
+    finally:
+        await pubsub.aclose()
@@ -0,0 +1,25 @@
+from functools import lru_cache
+from typing import List, Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+class Settings(BaseSettings):
+    """Application settings, read once from the environment and .env"""
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    openai_api_key: Optional[str] = None
+    anthropic_api_key: Optional[str] = None
+    deepseek_api_key: Optional[str] = None
+
+    def missing_api_keys(self) -> List[str]:
+        """Names of cloud providers that have no API key configured"""
+        keys = {
+            "openai": self.openai_api_key,
+            "anthropic": self.anthropic_api_key,
+            "deepseek": self.deepseek_api_key
+        }
+        return [provider for provider, key in keys.items() if not key]
+
+@lru_cache
+def get_settings() -> Settings:
+    """Get the process-wide settings"""
+    return Settings()
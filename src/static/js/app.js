@@ -3,6 +3,8 @@ let selectedProvider = null;
 let selectedModel = null;
 let currentSessionId = null;
 let ws = null;
+// Text accumulated from streamed deltas, keyed by message id
+const streamingText = {};
 
 // Available LLM providers
 const providers = [
@@ -164,11 +166,12 @@ async function startNewChat() {
             ws = new WebSocket(`ws://${window.location.host}/ws/chat/${data.session_id}`);
             ws = setupWebSocketReconnection(ws);
             
-            // Set up message handler with logging
+            // Messages arrive as binary JSON frames
+            ws.binaryType = 'arraybuffer';
+            const decoder = new TextDecoder();
             ws.onmessage = function(event) {
-                console.log('WebSocket message received:', event.data);
-                const data = JSON.parse(event.data);
-                handleMessage(data);
+                const text = typeof event.data === 'string' ? event.data : decoder.decode(event.data);
+                handleMessage(JSON.parse(text));
             };
         }
     } catch (error) {
@@ -179,10 +182,32 @@ async function startNewChat() {
 
 // Message handling
 function handleMessage(data) {
-    console.log('WebSocket message received:', typeof data === 'string' ? data : JSON.stringify(data, null, 2));
     const chatMessages = document.getElementById('chat-messages');
     
-    if (data.type === 'thinking') {
+    if (data.type === 'message_delta') {
+        // Append streamed text and render it as an in-progress assistant message
+        streamingText[data.id] = (streamingText[data.id] || '') + data.delta;
+        handleMessage({
+            type: 'message',
+            content: {
+                id: data.id,
+                role: 'assistant',
+                content: streamingText[data.id],
+                is_streaming: true
+            }
+        });
+    } else if (data.type === 'message_end') {
+        // Render the accumulated text as the final message
+        handleMessage({
+            type: 'message',
+            content: {
+                id: data.id,
+                role: 'assistant',
+                content: streamingText[data.id] || '',
+                is_streaming: false
+            }
+        });
+    } else if (data.type === 'thinking') {
         console.log('Processing thinking state:', data.value);
         const thinkingIndicator = document.getElementById('thinking-indicator');
         if (thinkingIndicator) {
@@ -282,6 +307,7 @@ function handleMessage(data) {
         // Reset state when message is complete
         if (!data.content.is_streaming) {
             console.log('Processing complete message');
+            delete streamingText[messageId];
             const thinkingIndicator = document.getElementById('thinking-indicator');
             if (thinkingIndicator) {
                 thinkingIndicator.style.display = 'none';
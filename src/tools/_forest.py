@@ -0,0 +1,57 @@
+import numpy as np
+from ._indicators import njit
+
+def pack_forest(model) -> tuple:
+    """Stack a fitted forest's trees into padded node arrays for forecast
+
+    Returns (feature, threshold, left, right, value), each shaped (n_trees, max_nodes).
+    Padding nodes are leaves and are never reached.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    shape = (len(trees), max(tree.node_count for tree in trees))
+    feature = np.zeros(shape, dtype=np.int64)
+    threshold = np.zeros(shape, dtype=np.float64)
+    left = np.full(shape, -1, dtype=np.int64)
+    right = np.full(shape, -1, dtype=np.int64)
+    value = np.zeros(shape, dtype=np.float64)
+    for i, tree in enumerate(trees):
+        n = tree.node_count
+        feature[i, :n] = tree.feature
+        threshold[i, :n] = tree.threshold
+        left[i, :n] = tree.children_left
+        right[i, :n] = tree.children_right
+        value[i, :n] = tree.value[:, 0, 0]
+    return feature, threshold, left, right, value
+
+# The input row is copied before it is shifted, so read-only windows are accepted
+@njit(
+    "f8[::1](Array(f4, 1, 'C', readonly=True), i8, i8[:, ::1], f8[:, ::1], i8[:, ::1], i8[:, ::1], f8[:, ::1])",
+    cache=True
+)
+def forecast(sequence: np.ndarray, days: int, feature: np.ndarray, threshold: np.ndarray,
+             left: np.ndarray, right: np.ndarray, value: np.ndarray) -> np.ndarray:
+    """Predict `days` steps ahead, feeding each prediction back into the input row
+
+    Walks the packed trees directly, averaging their leaves like RandomForestRegressor.predict.
+    """
+    row = sequence.copy()
+    n_trees = feature.shape[0]
+    predictions = np.empty(days)
+    for step in range(days):
+        total = 0.0
+        for tree in range(n_trees):
+            node = 0
+            while left[tree, node] != -1:
+                if row[feature[tree, node]] <= threshold[tree, node]:
+                    node = left[tree, node]
+                else:
+                    node = right[tree, node]
+            total += value[tree, node]
+        prediction = total / n_trees
+        predictions[step] = prediction
+
+        # Shift the row by one and append the prediction
+        for i in range(row.shape[0] - 1):
+            row[i] = row[i + 1]
+        row[-1] = prediction
+    return predictions
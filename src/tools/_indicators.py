@@ -0,0 +1,118 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it the kernels run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+RSI_WINDOW = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+# Window shared by the Bollinger bands and the moving averages
+WINDOW = 20
+BB_DEV = 2.0
+# Leading rows that are NaN in at least one indicator
+WARMUP = max(RSI_WINDOW, MACD_SLOW, WINDOW) - 1
+
+# Column layout of the feature matrix built by compute_features
+FEATURES = (
+    "Close", "Volume", "RSI", "MACD", "BB_upper", "BB_lower",
+    "SMA_20", "EMA_20", "Price_Change", "Volume_Change"
+)
+(CLOSE, VOLUME, RSI, MACD, BB_UPPER, BB_LOWER,
+ SMA_20, EMA_20, PRICE_CHANGE, VOLUME_CHANGE) = range(len(FEATURES))
+
+# Kernels are compiled for explicit signatures when this module is imported, and
+# cached on disk so later processes load them instead of recompiling.
+# The series are only read, so read-only arrays (pandas copy-on-write) are accepted.
+@njit(
+    "f4[:, ::1](Array(f8, 1, 'C', readonly=True), Array(f8, 1, 'C', readonly=True))",
+    cache=True,
+    error_model="numpy"
+)
+def compute_features(close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    """Feature matrix (see FEATURES) with every indicator computed in a single pass over the series
+
+    Matches the ta library's defaults, including NaN until each indicator's window is full.
+    The running state is float64; the matrix is float32, which is what sklearn's trees use.
+    """
+    n = close.shape[0]
+    out = np.full((n, len(FEATURES)), np.nan, dtype=np.float32)
+    if n == 0:
+        return out
+
+    rsi_alpha = 1.0 / RSI_WINDOW
+    fast_alpha = 2.0 / (MACD_FAST + 1)
+    slow_alpha = 2.0 / (MACD_SLOW + 1)
+    ema_alpha = 2.0 / (WINDOW + 1)
+
+    # Wilder-smoothed gains and losses; the first close has no change, which ta counts as zero
+    avg_gain = 0.0
+    avg_loss = 0.0
+    ema_fast = close[0]
+    ema_slow = close[0]
+    ema_20 = close[0]
+    window_sum = 0.0
+
+    for i in range(n):
+        price = close[i]
+        row = out[i]
+        row[CLOSE] = price
+        row[VOLUME] = volume[i]
+        if i > 0:
+            change = price - close[i - 1]
+            gain = change if change > 0 else 0.0
+            loss = -change if change < 0 else 0.0
+            avg_gain = (1 - rsi_alpha) * avg_gain + rsi_alpha * gain
+            avg_loss = (1 - rsi_alpha) * avg_loss + rsi_alpha * loss
+            ema_fast = (1 - fast_alpha) * ema_fast + fast_alpha * price
+            ema_slow = (1 - slow_alpha) * ema_slow + slow_alpha * price
+            ema_20 = (1 - ema_alpha) * ema_20 + ema_alpha * price
+            row[PRICE_CHANGE] = change / close[i - 1]
+            row[VOLUME_CHANGE] = (volume[i] - volume[i - 1]) / volume[i - 1]
+
+        if i >= RSI_WINDOW - 1:
+            row[RSI] = 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        if i >= MACD_SLOW - 1:
+            row[MACD] = ema_fast - ema_slow
+        if i >= WINDOW - 1:
+            row[EMA_20] = ema_20
+
+        # Rolling window: add the new price, drop the one leaving the window
+        window_sum += price
+        if i >= WINDOW:
+            window_sum -= close[i - WINDOW]
+        if i >= WINDOW - 1:
+            mean = window_sum / WINDOW
+            squares = 0.0
+            for j in range(i - WINDOW + 1, i + 1):
+                squares += (close[j] - mean) ** 2
+            std = np.sqrt(squares / WINDOW)
+            row[SMA_20] = mean
+            row[BB_UPPER] = mean + BB_DEV * std
+            row[BB_LOWER] = mean - BB_DEV * std
+
+    return out
+
+@njit("f4[:, ::1](f4[:, ::1])", cache=True)
+def minmax_scale(X: np.ndarray) -> np.ndarray:
+    """Scale each column of X to [0, 1] in place, like MinMaxScaler().fit_transform"""
+    n_rows, n_cols = X.shape
+    for col in range(n_cols):
+        lo = X[0, col]
+        hi = X[0, col]
+        for row in range(1, n_rows):
+            value = X[row, col]
+            if value < lo:
+                lo = value
+            if value > hi:
+                hi = value
+        # Constant columns map to zero, as sklearn does
+        scale = hi - lo if hi > lo else 1.0
+        for row in range(n_rows):
+            X[row, col] = (X[row, col] - lo) / scale
+    return X
@@ -1,12 +1,18 @@
 from typing import Optional, List, Dict, Any
+import asyncio
+import httpx
+import json
+import orjson
+import threading
 import requests
-from bs4 import BeautifulSoup
-from duckduckgo_search import DDGS
+import re
+import shlex
+import shutil
 import subprocess
 import os
-import psutil
-import tweepy
+from collections import deque
 from smolagents import Tool
+from cachetools import TTLCache
 
 class WebSearchTool(Tool):
     """DuckDuckGo search tool implementation"""
@@ -26,10 +32,35 @@ class WebSearchTool(Tool):
     }
     output_type = "string"
 
+    # Web results drift, so repeated queries are only served from cache for an hour
+    CACHE_TTL = 3600
+
+    def __init__(self):
+        super().__init__()
+        # One search session for all calls, so connections are reused. It is
+        # opened on the first search so importing the toolset stays cheap.
+        self._ddgs = None
+        self._cache = TTLCache(maxsize=512, ttl=self.CACHE_TTL)
+        self._cache_lock = threading.Lock()
+
     def forward(self, query: str, max_results: int = 5) -> str:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=max_results))
-            return str(results)
+        key = (query, max_results)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        results = orjson.dumps(list(self._session().text(query, max_results=max_results))).decode()
+        with self._cache_lock:
+            self._cache[key] = results
+        return results
+
+    def _session(self):
+        """The shared DDGS session, opened on first use"""
+        with self._cache_lock:
+            if self._ddgs is None:
+                from duckduckgo_search import DDGS
+                self._ddgs = DDGS()
+            return self._ddgs
 
 class WebScrapeTool(Tool):
     """Web scraping tool implementation"""
@@ -43,18 +74,42 @@ class WebScrapeTool(Tool):
     }
     output_type = "string"
 
+    def __init__(self):
+        super().__init__()
+        # Reuse connections across scrapes
+        self._client = requests.Session()
+
     def forward(self, url: str) -> str:
         try:
-            response = requests.get(url)
+            response = self._client.get(url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            return soup.get_text()
+            return self._extract_text(response.text)
         except Exception as e:
             return f"Error scraping webpage: {str(e)}"
 
+    async def aforward(self, urls: List[str]) -> List[str]:
+        """Scrape several pages concurrently"""
+        async with httpx.AsyncClient(follow_redirects=True) as client:
+            async def scrape(url: str) -> str:
+                try:
+                    response = await client.get(url)
+                    response.raise_for_status()
+                    return self._extract_text(response.text)
+                except Exception as e:
+                    return f"Error scraping webpage: {str(e)}"
+
+            return list(await asyncio.gather(*[scrape(url) for url in urls]))
+
+    @staticmethod
+    def _extract_text(html: str) -> str:
+        """Visible text of an HTML page"""
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'lxml')
+        # Remove script, style and other non-text elements
+        for element in soup(["script", "style", "noscript", "svg"]):
+            element.decompose()
+        return soup.get_text()
+
 class SystemCommandTool(Tool):
     """System command execution tool"""
     name = "system_command"
@@ -67,19 +122,77 @@ class SystemCommandTool(Tool):
     }
     output_type = "string"
 
+    TIMEOUT = 30
+    # Only the last lines of each stream are kept, so verbose commands can't exhaust memory.
+    # Longer lines are read in pieces of MAX_LINE_LENGTH, each counting as a line, which
+    # bounds the captured output at MAX_OUTPUT_LINES * MAX_LINE_LENGTH characters per stream.
+    MAX_OUTPUT_LINES = 10_000
+    MAX_LINE_LENGTH = 1000
+    # Commands using any of these need a shell to interpret them
+    SHELL_CHARS = frozenset("|&;<>()$`*?[]{}~\n")
+    # Variable assignments such as X=1, which only a shell applies
+    ASSIGNMENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*=")
+
     def forward(self, command: str) -> str:
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            return result.stdout if result.stdout else result.stderr
+            stdout, stderr = self._run(command)
+            return stdout if stdout else stderr
         except Exception as e:
             return f"Error executing command: {str(e)}"
 
+    def _split_plain(self, command: str) -> Optional[List[str]]:
+        """Arguments of a command that runs the same without a shell, or None if it needs one"""
+        if self.SHELL_CHARS.intersection(command):
+            return None
+        try:
+            args = shlex.split(command)
+        except ValueError:
+            return None
+        # Builtins (cd, export), assignments and comments only mean something to a shell
+        if not args or shutil.which(args[0]) is None:
+            return None
+        if any(self.ASSIGNMENT.match(arg) or arg.startswith("#") for arg in args):
+            return None
+        return args
+
+    def _read_tail(self, pipe, output: deque) -> None:
+        """Read a stream to the end, keeping its last lines in output"""
+        for line in iter(lambda: pipe.readline(self.MAX_LINE_LENGTH), ""):
+            output.append(line)
+
+    def _run(self, command: str) -> tuple:
+        """Run a command and return the tail of its stdout and stderr"""
+        args = self._split_plain(command)
+        # Plain commands are executed directly, skipping the extra shell process
+        proc = subprocess.Popen(
+            args or command,
+            shell=not args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=1,
+            text=True
+        )
+        outputs = (deque(maxlen=self.MAX_OUTPUT_LINES), deque(maxlen=self.MAX_OUTPUT_LINES))
+        readers = [
+            threading.Thread(target=self._read_tail, args=(pipe, output), daemon=True)
+            for pipe, output in zip((proc.stdout, proc.stderr), outputs)
+        ]
+        for reader in readers:
+            reader.start()
+        try:
+            proc.wait(timeout=self.TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            # Children of a killed shell may still hold the pipes open, so don't wait on them forever
+            for reader in readers:
+                reader.join(timeout=1)
+            proc.stdout.close()
+            proc.stderr.close()
+        return "".join(outputs[0]), "".join(outputs[1])
+
 class FileSystemTool(Tool):
     """File system operations tool"""
     name = "file_system"
@@ -102,9 +215,16 @@ class FileSystemTool(Tool):
     }
     output_type = "string"
 
+    # Files larger than this are returned as head and tail excerpts
+    MAX_READ_BYTES = 10 * 1024 * 1024
+    EXCERPT_BYTES = 64 * 1024
+
     def forward(self, operation: str, path: str, content: Optional[str] = None) -> str:
         try:
             if operation == "read":
+                size = os.path.getsize(path)
+                if size > self.MAX_READ_BYTES:
+                    return self._read_excerpt(path, size)
                 with open(path, 'r') as f:
                     return f.read()
             elif operation == "write":
@@ -112,10 +232,24 @@ class FileSystemTool(Tool):
                     f.write(content)
                 return f"Successfully wrote to {path}"
             elif operation == "list":
-                return str(os.listdir(path))
+                with os.scandir(path) as entries:
+                    return json.dumps([entry.name for entry in entries])
         except Exception as e:
             return f"Error performing file operation: {str(e)}"
 
+    def _read_excerpt(self, path: str, size: int) -> str:
+        """Beginning and end of a large file, without loading the rest"""
+        with open(path, 'rb') as f:
+            head = f.read(self.EXCERPT_BYTES)
+            f.seek(-self.EXCERPT_BYTES, os.SEEK_END)
+            tail = f.read()
+        skipped = size - len(head) - len(tail)
+        return (
+            head.decode('utf-8', 'replace')
+            + f"\n... [{skipped} bytes truncated] ...\n"
+            + tail.decode('utf-8', 'replace')
+        )
+
 class TwitterSearchTool(Tool):
     """Twitter search tool implementation"""
     name = "twitter_search"
@@ -143,6 +277,7 @@ class TwitterSearchTool(Tool):
         
         if all([api_key, api_secret, access_token, access_token_secret]):
             try:
+                import tweepy
                 auth = tweepy.OAuthHandler(api_key, api_secret)
                 auth.set_access_token(access_token, access_token_secret)
                 self.api = tweepy.API(auth)
@@ -163,12 +298,40 @@ class TwitterSearchTool(Tool):
             results = [{
                 'text': tweet.text,
                 'user': tweet.user.screen_name,
-                'created_at': str(tweet.created_at)
+                'created_at': tweet.created_at
             } for tweet in tweets]
-            return str(results)
+            return orjson.dumps(results, option=orjson.OPT_NAIVE_UTC).decode()
         except Exception as e:
             return f"Error searching Twitter: {str(e)}"
 
+# Static CPU facts, read when the sampler starts
+_CPU_COUNT: Optional[int] = None
+_CPU_FREQ: Optional[Dict[str, float]] = None
+
+# Latest CPU utilisation, refreshed every second by a background sampler
+_cpu_percent: Optional[float] = None
+_sampler_lock = threading.Lock()
+_sampler: Optional[threading.Thread] = None
+
+def _sample_cpu() -> None:
+    """Keep _cpu_percent current"""
+    global _cpu_percent
+    import psutil
+    while True:
+        _cpu_percent = psutil.cpu_percent(interval=1)
+
+def _start_cpu_sampler() -> None:
+    """Start the CPU sampler thread once per process"""
+    global _sampler, _CPU_COUNT, _CPU_FREQ
+    with _sampler_lock:
+        if _sampler is None:
+            import psutil
+            _CPU_COUNT = psutil.cpu_count()
+            cpu_freq = psutil.cpu_freq()
+            _CPU_FREQ = cpu_freq._asdict() if cpu_freq else None
+            _sampler = threading.Thread(target=_sample_cpu, name="cpu-sampler", daemon=True)
+            _sampler.start()
+
 class SystemInfoTool(Tool):
     """System information tool"""
     name = "system_info"
@@ -184,11 +347,17 @@ class SystemInfoTool(Tool):
 
     def forward(self, metric: str) -> str:
         try:
+            # psutil and the sampler are only loaded once a metric is asked for, since
+            # the default toolset is built whenever this module is imported
+            import psutil
             if metric == "cpu":
+                _start_cpu_sampler()
+                # Until the sampler's first reading lands, take a short sample instead
+                cpu_percent = _cpu_percent if _cpu_percent is not None else psutil.cpu_percent(interval=0.1)
                 info = {
-                    "cpu_percent": psutil.cpu_percent(interval=1),
-                    "cpu_count": psutil.cpu_count(),
-                    "cpu_freq": psutil.cpu_freq()._asdict()
+                    "cpu_percent": cpu_percent,
+                    "cpu_count": _CPU_COUNT,
+                    "cpu_freq": _CPU_FREQ
                 }
             elif metric == "memory":
                 mem = psutil.virtual_memory()
@@ -205,6 +374,29 @@ class SystemInfoTool(Tool):
                     "free": disk.free,
                     "percent": disk.percent
                 }
-            return str(info)
+            return orjson.dumps(info).decode()
         except Exception as e:
-            return f"Error getting system info: {str(e)}" 
\ No newline at end of file
+            return f"Error getting system info: {str(e)}" 
+
+# Default toolset, built once at import. The tools hold no per-session state,
+# so agent managers share these instances instead of constructing their own.
+DEFAULT_TOOLS = [
+    WebSearchTool(),
+    WebScrapeTool(),
+    SystemCommandTool(),
+    FileSystemTool(),
+    TwitterSearchTool(),
+    SystemInfoTool()
+]
+
+def tool_metadata(tool: Tool) -> Dict[str, Any]:
+    """Describe a tool for the API"""
+    return {
+        'name': tool.name,
+        'description': tool.description,
+        'inputs': tool.inputs,
+        'output_type': tool.output_type
+    }
+
+# Metadata for the default toolset, served as-is by /api/tools
+TOOL_METADATA = [tool_metadata(tool) for tool in DEFAULT_TOOLS]
@@ -2,11 +2,60 @@ from smolagents import Tool
 import yfinance as yf
 import pandas as pd
 import numpy as np
+import hashlib
+import threading
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.ensemble import RandomForestRegressor
-import ta
+from cachetools import TTLCache
+from numpy.lib.stride_tricks import sliding_window_view
+from ._forest import forecast, pack_forest
+from ._indicators import FEATURES, CLOSE, WARMUP, compute_features, minmax_scale
+
+# Daily price history only changes once a day, so it is kept per (ticker, date)
+HISTORY_TTL = 24 * 3600
+_history_cache = TTLCache(maxsize=256, ttl=HISTORY_TTL)
+_history_lock = threading.Lock()
+
+# Fitted models per training set: repeat predictions for a ticker on the same day
+# train on identical data, so they reuse the first fit
+MODEL_TTL = 24 * 3600
+_model_cache = TTLCache(maxsize=64, ttl=MODEL_TTL)
+_model_lock = threading.Lock()
+
+def _get_histories(tickers: List[str], start_date: datetime, end_date: datetime) -> Dict[str, pd.DataFrame]:
+    """Price history per ticker, fetched at most once per day; missing tickers share one download"""
+    histories = {}
+    with _history_lock:
+        for ticker in tickers:
+            df = _history_cache.get((ticker, end_date.date()))
+            if df is not None:
+                histories[ticker] = df
+    missing = [ticker for ticker in tickers if ticker not in histories]
+    if not missing:
+        return histories
+
+    data = yf.download(
+        missing,
+        start=start_date,
+        end=end_date,
+        group_by='ticker',
+        auto_adjust=True,
+        threads=True,
+        progress=False
+    )
+    for ticker in missing:
+        if isinstance(data.columns, pd.MultiIndex):
+            df = data[ticker] if ticker in data.columns.get_level_values(0) else pd.DataFrame()
+        else:
+            df = data
+        # Tickers are aligned on a shared date index, so drop the days this one didn't trade
+        if not df.empty:
+            df = df.dropna(subset=['Close', 'Volume'])
+        if not df.empty:
+            with _history_lock:
+                _history_cache[(ticker, end_date.date())] = df
+        histories[ticker] = df
+    return histories
 
 class StockPredictionTool(Tool):
     name = "stock_prediction"
@@ -18,128 +67,152 @@ class StockPredictionTool(Tool):
             "required": True
         }
     }
-    output_type = "json"
+    output_type = "object"
+
+    # Summary labels, indexed by (above threshold) + 2 * (below threshold)
+    RSI_LABELS = ("Neutral", "Overbought", "Oversold")
+    MACD_LABELS = ("Bearish", "Bullish")
+    BOLLINGER_LABELS = ("Middle", "Upper Band", "Lower Band")
+    TREND_LABELS = ("Downward", "Upward")
 
     def __init__(self):
         super().__init__()
-        self.scaler = MinMaxScaler()
+        # sklearn is imported here rather than at module level: the toolset is loaded
+        # at startup whether or not a prediction is ever requested
+        from sklearn.ensemble import RandomForestRegressor
+        # A small, shallow forest is plenty for a few months of daily rows
         self.model = RandomForestRegressor(
-            n_estimators=100,
-            random_state=42
+            n_estimators=30,
+            max_depth=8,
+            random_state=42,
+            n_jobs=1
         )
 
-    def _get_stock_data(self, ticker: str) -> pd.DataFrame:
-        """Fetch historical stock data and calculate technical indicators."""
-        # Get data for the last 60 days (30 for training, 30 for features)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=60)
-        
-        # Fetch data
-        stock = yf.Ticker(ticker)
-        df = stock.history(start=start_date, end=end_date)
-        
+    def _get_stock_data(self, ticker: str, df: pd.DataFrame) -> np.ndarray:
+        """Calculate technical indicators from a ticker's price history."""
         if df.empty:
             raise ValueError(f"No data found for ticker {ticker}")
 
-        # Calculate technical indicators
-        df['RSI'] = ta.momentum.RSIIndicator(df['Close']).rsi()
-        df['MACD'] = ta.trend.MACD(df['Close']).macd()
-        df['BB_upper'] = ta.volatility.BollingerBands(df['Close']).bollinger_hband()
-        df['BB_lower'] = ta.volatility.BollingerBands(df['Close']).bollinger_lband()
-        df['SMA_20'] = ta.trend.SMAIndicator(df['Close'], window=20).sma_indicator()
-        df['EMA_20'] = ta.trend.EMAIndicator(df['Close'], window=20).ema_indicator()
-        
-        # Add price changes
-        df['Price_Change'] = df['Close'].pct_change()
-        df['Volume_Change'] = df['Volume'].pct_change()
-        
-        # Drop any NaN values
-        df = df.dropna()
-        
-        return df
-
-    def _prepare_features(self, df: pd.DataFrame) -> tuple:
-        """Prepare features for prediction."""
-        features = [
-            'Close', 'Volume', 'RSI', 'MACD', 
-            'BB_upper', 'BB_lower', 'SMA_20', 'EMA_20',
-            'Price_Change', 'Volume_Change'
-        ]
+        # Calculate technical indicators and price changes in one pass, straight
+        # into a row-major feature matrix (columns as in FEATURES)
+        features = compute_features(
+            np.ascontiguousarray(df['Close'].to_numpy(), dtype=np.float64),
+            np.ascontiguousarray(df['Volume'].to_numpy(), dtype=np.float64)
+        )
         
-        X = df[features].values
-        y = df['Close'].values
+        # Past the indicator warm-up, only zero-volume days leave NaN or infinite
+        # volume changes; those rows are dropped before scaling and training
+        features = features[WARMUP:]
+        finite = np.isfinite(features).all(axis=1)
+        return features if finite.all() else features[finite]
+
+    def _prepare_features(self, features: np.ndarray) -> tuple:
+        """Prepare features for prediction, scaling the matrix in place."""
+        # Regression targets stay float64, as sklearn expects
+        y = features[:, CLOSE].astype(np.float64)
         
         # Scale the features
-        X_scaled = self.scaler.fit_transform(X)
+        X_scaled = minmax_scale(features)
         
         return X_scaled, y
 
     def _create_sequences(self, X: np.ndarray, y: np.ndarray, lookback: int = 30) -> tuple:
         """Create sequences for training."""
-        X_seq, y_seq = [], []
+        # Each window of `lookback` rows predicts the close that follows it
+        n_samples = max(len(X) - lookback, 0)
+        windows = sliding_window_view(X, (lookback, X.shape[1]))[:n_samples, 0]
         
-        for i in range(len(X) - lookback):
-            X_seq.append(X[i:i + lookback])
-            y_seq.append(y[i + lookback])
-            
-        return np.array(X_seq), np.array(y_seq)
+        # The regressor takes each lookback window as one flat row
+        return windows.reshape(n_samples, -1), y[lookback:]
+
+    def _train(self, X_seq: np.ndarray, y_seq: np.ndarray) -> Any:
+        """Fit a copy of the model, reusing an earlier fit on identical data"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((sorted(self.model.get_params().items()), X_seq.shape)).encode())
+        digest.update(np.ascontiguousarray(X_seq).tobytes())
+        digest.update(np.ascontiguousarray(y_seq).tobytes())
+        key = digest.hexdigest()
+
+        with _model_lock:
+            model = _model_cache.get(key)
+        if model is None:
+            from sklearn.base import clone
+            model = clone(self.model).fit(X_seq, y_seq)
+            with _model_lock:
+                _model_cache[key] = model
+        return model
 
     def _predict_next_days(self, model, last_sequence: np.ndarray, days: int = 7) -> List[float]:
         """Predict the next n days of stock prices."""
-        predictions = []
-        current_sequence = last_sequence.copy()
-        
-        for _ in range(days):
-            # Predict the next day
-            pred = model.predict(current_sequence.reshape(1, -1))[0]
-            predictions.append(pred)
-            
-            # Update the sequence
-            current_sequence = np.roll(current_sequence, -1)
-            current_sequence[-1] = pred
-            
-        return predictions
+        # Walk the fitted trees in a compiled loop: for a single row, the forest's
+        # input validation and joblib dispatch cost more than the prediction itself
+        sequence = np.ascontiguousarray(last_sequence.ravel(), dtype=np.float32)
+        return forecast(sequence, days, *pack_forest(model)).tolist()
 
-    def forward(self, **inputs) -> Dict[str, Any]:
-        ticker = inputs["ticker"].upper()
+    def forward(self, ticker: str) -> Dict[str, Any]:
+        ticker = ticker.upper()
+        return self.forward_many([ticker])[ticker]
+
+    def forward_many(self, tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Predict several tickers, fetching all their histories in one batched download."""
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        
+        # Get roughly 120 trading days: the indicators need ~35 days to warm up and
+        # each training sample looks back 30 days
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=180)
+        
+        # Calculate prediction dates once, as of the request
+        today = end_date.date()
+        prediction_dates = [(today + timedelta(days=i)).isoformat() for i in range(1, 8)]
         
         try:
-            # Get stock data and calculate indicators
-            df = self._get_stock_data(ticker)
+            histories = _get_histories(tickers, start_date, end_date)
+        except Exception as e:
+            return {
+                ticker: {"error": f"Failed to predict stock prices: {str(e)}", "ticker": ticker}
+                for ticker in tickers
+            }
+        return {ticker: self._predict(ticker, histories[ticker], prediction_dates) for ticker in tickers}
+
+    def _predict(self, ticker: str, history: pd.DataFrame, prediction_dates: List[str]) -> Dict[str, Any]:
+        """Run the indicator, training and forecast pipeline for one ticker."""
+        try:
+            # Calculate indicators
+            features = self._get_stock_data(ticker, history)
+            # Keep the raw values the summary needs; scaling overwrites the matrix
+            close = features[:, CLOSE].copy()
+            last = dict(zip(FEATURES, features[-1].tolist()))
             
             # Prepare features
-            X, y = self_prepare_features(df)
+            X, y = self._prepare_features(features)
             
             # Create sequences
             X_seq, y_seq = self._create_sequences(X, y)
             
             # Train the model
-            self.model.fit(X_seq, y_seq)
+            model = self._train(X_seq, y_seq)
             
             # Get the last sequence for prediction
             last_sequence = X_seq[-1]
             
             # Make predictions
-            predictions = self._predict_next_days(self.model, last_sequence)
-            
-            # Get current stock info
-            stock = yf.Ticker(ticker)
-            current_price = stock.info.get('regularMarketPrice', 0)
+            predictions = self._predict_next_days(model, last_sequence, days=len(prediction_dates))
             
-            # Calculate prediction dates
-            prediction_dates = [
-                (datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d')
-                for i in range(1, 8)
-            ]
+            # The last close is the current price; quoting it separately would cost another request
+            current_price = float(history['Close'].to_numpy()[-1])
             
             # Prepare technical analysis summary
-            last_row = df.iloc[-1]
+            # Compare every level against its threshold at once, then look the labels up by state
+            levels = np.array([last['RSI'], last['RSI'], last['MACD'], last['Close'], last['Close'], last['Close']])
+            thresholds = np.array([70, 30, 0, last['BB_upper'], last['BB_lower'], last['SMA_20']])
+            above = (levels > thresholds).astype(int)
+            below = (levels < thresholds).astype(int)
             analysis = {
-                "RSI": "Overbought" if last_row['RSI'] > 70 else "Oversold" if last_row['RSI'] < 30 else "Neutral",
-                "MACD": "Bullish" if last_row['MACD'] > 0 else "Bearish",
-                "Bollinger": "Upper Band" if last_row['Close'] > last_row['BB_upper'] else 
-                            "Lower Band" if last_row['Close'] < last_row['BB_lower'] else "Middle",
-                "Trend": "Upward" if last_row['Close'] > last_row['SMA_20'] else "Downward"
+                "RSI": self.RSI_LABELS[above[0] + 2 * below[1]],
+                "MACD": self.MACD_LABELS[above[2]],
+                "Bollinger": self.BOLLINGER_LABELS[above[3] + 2 * below[4]],
+                "Trend": self.TREND_LABELS[above[5]]
             }
             
             return {
@@ -151,8 +224,8 @@ class StockPredictionTool(Tool):
                 },
                 "technical_analysis": analysis,
                 "confidence_metrics": {
-                    "model_score": round(self.model.score(X_seq, y_seq), 3),
-                    "last_30_days_volatility": round(df['Close'].pct_change().std() * 100, 2)
+                    "model_score": round(model.score(X_seq, y_seq), 3),
+                    "last_30_days_volatility": round(float(np.std(np.diff(close) / close[:-1], ddof=1)) * 100, 2)
                 }
             }
             
@@ -1,8 +1,12 @@
 import pytest
+import time
+from src import llm_cache
+from src.metrics import STAGE_SECONDS
 from src.agent_manager import AgentManager
 from src.llm import OpenAIProvider, AnthropicProvider
 from src.tools.base_tools import WebSearchTool
 from smolagents import Tool
+from smolagents.agents import ActionStep, AgentMaxStepsError
 
 class MockTool(Tool):
     name = "mock_tool"
@@ -25,7 +29,7 @@ class MockLLMProvider:
     def get_tool_call(self, messages, available_tools, stop_sequences, **kwargs):
         return None
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_llm_provider():
     return MockLLMProvider()
 
@@ -33,10 +37,32 @@ def mock_llm_provider():
 def mock_tool():
     return MockTool()
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def agent_manager(mock_llm_provider):
+    # Building the agent is the slow part, so the tests share one manager
     return AgentManager(llm_provider=mock_llm_provider)
 
+@pytest.fixture(autouse=True)
+def agent_manager_reset(agent_manager):
+    """Restore the shared manager's tools, imports and configuration after each test"""
+    tools, tools_info = list(agent_manager.tools), agent_manager._tools_info
+    agent, agent_tools = agent_manager.agent, dict(agent_manager.agent.tools)
+    executor_tools = agent_manager._executor_tools()
+    executor_snapshot = dict(executor_tools) if executor_tools is not None else None
+    authorized_imports = agent_manager.authorized_imports
+    llm_provider, max_steps, verbose = agent_manager.llm_provider, agent_manager.max_steps, agent_manager.verbose
+    yield
+    agent_manager.tools, agent_manager._tools_info = tools, tools_info
+    agent_manager._set_authorized_imports(authorized_imports)
+    # A test may have rebuilt the agent (new imports) or changed its tools in place
+    agent_manager.agent = agent
+    agent.tools.clear()
+    agent.tools.update(agent_tools)
+    if executor_tools is not None:
+        executor_tools.clear()
+        executor_tools.update(executor_snapshot)
+    agent_manager.update_configuration(llm_provider=llm_provider, max_steps=max_steps, verbose=verbose)
+
 def test_agent_manager_initialization(agent_manager):
     assert agent_manager.llm_provider is not None
     assert len(agent_manager.tools) > 0
@@ -49,6 +75,12 @@ def test_add_tool(agent_manager, mock_tool):
     assert len(agent_manager.tools) == initial_tool_count + 1
     assert any(tool.name == mock_tool.name for tool in agent_manager.tools)
 
+def test_add_tool_keeps_agent(agent_manager, mock_tool):
+    agent = agent_manager.agent
+    agent_manager.add_tool(mock_tool)
+    assert agent_manager.agent is agent
+    assert mock_tool.name in agent.tools
+
 def test_remove_tool(agent_manager, mock_tool):
     agent_manager.add_tool(mock_tool)
     initial_tool_count = len(agent_manager.tools)
@@ -76,6 +108,37 @@ def test_process_request_with_stream(agent_manager):
     response = agent_manager.process_request("Test request", stream=True)
     assert response is not None
 
+def test_process_request_stream_timed_until_exhausted(agent_manager, monkeypatch):
+    def steps(*args, **kwargs):
+        time.sleep(0.05)
+        yield "done"
+
+    monkeypatch.setattr(agent_manager.agent, "run", steps)
+    agent_seconds = STAGE_SECONDS.labels(stage="agent", provider="MockLLMProvider")._sum
+    before = agent_seconds.get()
+    response = agent_manager.process_request("Timed request", stream=True, use_cache=False)
+    assert agent_seconds.get() == before
+    assert list(response) == ["done"]
+    assert agent_seconds.get() - before >= 0.05
+
+def test_process_request_cache_hit(agent_manager):
+    llm_cache.clear()
+    llm_cache.put(agent_manager.cache_key("Cached  request"), "Cached answer")
+    assert agent_manager.process_request("Cached request") == "Cached answer"
+    llm_cache.clear()
+
+def test_failed_run_is_not_cached(agent_manager, monkeypatch):
+    llm_cache.clear()
+    monkeypatch.setattr(agent_manager.agent, "run", lambda *args, **kwargs: "Fallback answer")
+    monkeypatch.setattr(agent_manager.agent, "logs", [ActionStep(error=AgentMaxStepsError("Reached max steps."))])
+    assert agent_manager.process_request("Failing request") == "Fallback answer"
+    assert llm_cache.get(agent_manager.cache_key("Failing request")) is None
+
+    monkeypatch.setattr(agent_manager.agent, "logs", [ActionStep()])
+    agent_manager.process_request("Failing request")
+    assert llm_cache.get(agent_manager.cache_key("Failing request")) == "Fallback answer"
+    llm_cache.clear()
+
 def test_update_configuration(agent_manager, mock_llm_provider):
     new_max_steps = 20
     new_verbose = not agent_manager.verbose
@@ -89,6 +152,7 @@ def test_update_configuration(agent_manager, mock_llm_provider):
     assert agent_manager.llm_provider == mock_llm_provider
     assert agent_manager.max_steps == new_max_steps
     assert agent_manager.verbose == new_verbose
+    assert agent_manager.agent.max_steps == new_max_steps
 
 def test_get_agent_status(agent_manager):
     status = agent_manager.get_agent_status()
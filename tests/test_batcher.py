@@ -0,0 +1,210 @@
+import asyncio
+import concurrent.futures
+import pytest
+from src.batcher import RequestBatcher, BatchedProvider
+from src.llm import LLMProvider
+from src.metrics import request_id
+
+class RecordingProvider(LLMProvider):
+    def __init__(self, model_name="mock-model"):
+        self.model_name = model_name
+        self.batches = []
+
+    def __call__(self, messages, stop_sequences=None, **kwargs):
+        return f"echo: {messages[-1]['content']}"
+
+    def generate_response(self, messages, system_prompt=None, stream=False, **kwargs):
+        return self(messages)
+
+    def get_tool_call(self, messages, available_tools, stop_sequences, **kwargs):
+        return None
+
+    async def abatch(self, batch, stop_sequences=None, **kwargs):
+        self.batches.append(len(batch))
+        return await super().abatch(batch, stop_sequences, **kwargs)
+
+@pytest.fixture
+def provider():
+    return RecordingProvider()
+
+def test_concurrent_calls_share_one_batch(provider):
+    async def run():
+        batcher = RequestBatcher(batch_window=0.05)
+        batcher.start()
+        try:
+            return await asyncio.gather(*[
+                batcher.submit(provider, [{"role": "user", "content": f"prompt {i}"}])
+                for i in range(3)
+            ])
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+    assert results == ["echo: prompt 0", "echo: prompt 1", "echo: prompt 2"]
+    assert provider.batches == [3]
+
+def test_different_models_are_not_batched_together():
+    first, second = RecordingProvider("model-a"), RecordingProvider("model-b")
+
+    async def run():
+        batcher = RequestBatcher(batch_window=0.05)
+        batcher.start()
+        try:
+            await asyncio.gather(
+                batcher.submit(first, [{"role": "user", "content": "a"}]),
+                batcher.submit(second, [{"role": "user", "content": "b"}])
+            )
+        finally:
+            await batcher.stop()
+
+    asyncio.run(run())
+    assert first.batches == [1]
+    assert second.batches == [1]
+
+def test_batched_provider_calls_directly_without_batcher(provider):
+    batched = BatchedProvider(provider, RequestBatcher())
+    assert batched([{"role": "user", "content": "hi"}]) == "echo: hi"
+    assert provider.batches == []
+    assert batched.model_name == provider.model_name
+
+def test_one_failing_call_does_not_fail_its_batch():
+    class PickyProvider(RecordingProvider):
+        calls = 0
+
+        def __call__(self, messages, stop_sequences=None, **kwargs):
+            PickyProvider.calls += 1
+            if messages[-1]["content"] == "bad":
+                raise ValueError("context too long")
+            return super().__call__(messages, stop_sequences, **kwargs)
+
+    provider = PickyProvider()
+
+    async def run():
+        batcher = RequestBatcher(batch_window=0.05)
+        batcher.start()
+        try:
+            return await asyncio.gather(*[
+                batcher.submit(provider, [{"role": "user", "content": content}])
+                for content in ("good", "bad", "fine")
+            ], return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    good, bad, fine = asyncio.run(run())
+    # Each prompt was sent once, in one batch
+    assert provider.batches == [3]
+    assert PickyProvider.calls == 3
+    assert good == "echo: good"
+    assert isinstance(bad, ValueError) and str(bad) == "context too long"
+    assert fine == "echo: fine"
+
+def test_failed_batch_is_retried_per_call():
+    class FailingBatchProvider(RecordingProvider):
+        def __call__(self, messages, stop_sequences=None, **kwargs):
+            if messages[-1]["content"] == "bad":
+                raise ValueError("context too long")
+            return super().__call__(messages, stop_sequences, **kwargs)
+
+        async def abatch(self, batch, stop_sequences=None, **kwargs):
+            self.batches.append(len(batch))
+            raise ValueError("batch rejected")
+
+    provider = FailingBatchProvider()
+
+    async def run():
+        batcher = RequestBatcher(batch_window=0.05)
+        batcher.start()
+        try:
+            return await asyncio.gather(*[
+                batcher.submit(provider, [{"role": "user", "content": content}])
+                for content in ("good", "bad", "fine")
+            ], return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    good, bad, fine = asyncio.run(run())
+    assert provider.batches == [3]
+    assert good == "echo: good"
+    assert isinstance(bad, ValueError) and str(bad) == "context too long"
+    assert fine == "echo: fine"
+
+def test_cancel_resolves_a_requests_batched_calls():
+    class SlowProvider(RecordingProvider):
+        async def abatch(self, batch, stop_sequences=None, **kwargs):
+            await asyncio.sleep(0.5)
+            return await super().abatch(batch, stop_sequences, **kwargs)
+
+    provider = SlowProvider()
+
+    async def run():
+        batcher = RequestBatcher(batch_window=0.01)
+        batcher.start()
+        batched = BatchedProvider(provider, batcher)
+
+        def attempt(message_id):
+            try:
+                return batched([{"role": "user", "content": message_id}])
+            except concurrent.futures.CancelledError as e:
+                return e
+
+        async def call(message_id):
+            # Agent runs call the provider from worker threads, within their request's context
+            request_id.set(message_id)
+            return await asyncio.to_thread(attempt, message_id)
+
+        try:
+            cancelled = asyncio.ensure_future(call("cancelled"))
+            other = asyncio.ensure_future(call("other"))
+            await asyncio.sleep(0.1)
+            batched.cancel_request("cancelled")
+            assert isinstance(await asyncio.wait_for(cancelled, 0.2), concurrent.futures.CancelledError)
+            assert await other == "echo: other"
+            # Further calls made by the cancelled run fail straight away
+            assert isinstance(await asyncio.wait_for(call("cancelled"), 0.2), concurrent.futures.CancelledError)
+        finally:
+            await batcher.stop()
+
+    asyncio.run(run())
+
+def test_batched_call_times_out_when_the_batch_is_stuck():
+    class StuckProvider(RecordingProvider):
+        async def abatch(self, batch, stop_sequences=None, **kwargs):
+            await asyncio.sleep(10)
+
+    async def run():
+        batcher = RequestBatcher(batch_window=0.01)
+        batcher.start()
+        batched = BatchedProvider(StuckProvider(), batcher)
+        batched.CALL_TIMEOUT = 0.1
+        try:
+            with pytest.raises(TimeoutError):
+                await asyncio.to_thread(batched, [{"role": "user", "content": "hi"}])
+            await asyncio.sleep(0)
+            # The abandoned call no longer waits in the batcher
+            assert batcher._pending == {}
+        finally:
+            await batcher.stop()
+
+    asyncio.run(run())
+
+def test_calls_cancelled_while_queued_are_not_sent(provider):
+    async def run():
+        batcher = RequestBatcher(batch_window=0.1)
+        batcher.start()
+
+        async def call(message_id):
+            request_id.set(message_id)
+            return await batcher.submit(provider, [{"role": "user", "content": message_id}])
+
+        try:
+            calls = [asyncio.ensure_future(call(message_id)) for message_id in ("cancelled", "kept")]
+            await asyncio.sleep(0.02)
+            batcher.cancel("cancelled")
+            return await asyncio.gather(*calls, return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    cancelled, kept = asyncio.run(run())
+    assert isinstance(cancelled, asyncio.CancelledError)
+    assert kept == "echo: kept"
+    assert provider.batches == [1]
@@ -1,6 +1,12 @@
+import asyncio
+import json
+import httpx
 import pytest
 import os
-from src.llm import OpenAIProvider, AnthropicProvider
+import time
+from src.llm import OpenAIProvider, AnthropicProvider, OllamaProvider, DeepSeekProvider, cached_response
+from src import llm_cache
+from src.metrics import request_id
 from smolagents import Tool
 
 class TestTool(Tool):
@@ -113,4 +119,240 @@ def test_anthropic_provider_invalid_model():
     
     with pytest.raises(Exception):
         provider = AnthropicProvider(model_name="invalid-model")
-        provider.generate_response([{"role": "user", "content": "test"}]) 
\ No newline at end of file
+        provider.generate_response([{"role": "user", "content": "test"}]) 
+
+def test_anthropic_marks_system_prompt_cacheable():
+    provider = AnthropicProvider(api_key="test-key")
+    args = provider._request_args([
+        {"role": "system", "content": "You are an agent"},
+        {"role": "user", "content": "Hello"}
+    ])
+    assert args["system"] == [{"type": "text", "text": "You are an agent", "cache_control": {"type": "ephemeral"}}]
+    assert args["messages"] == [{"role": "user", "content": "Human: Hello"}]
+
+def test_cached_response_skips_repeat_calls():
+    class CountingProvider(OllamaProvider):
+        calls = 0
+
+        @cached_response
+        def __call__(self, messages, stop_sequences=None, **kwargs):
+            CountingProvider.calls += 1
+            return "answer"
+
+    llm_cache.clear()
+    provider = CountingProvider("counting-model")
+    messages = [{"role": "user", "content": "Same question"}]
+    assert provider(messages, temperature=0) == "answer"
+    assert provider(messages, temperature=0) == "answer"
+    assert CountingProvider.calls == 1
+
+    # Sampled completions are not cached, including at the provider's default temperature
+    provider(messages, temperature=0.7)
+    provider(messages, temperature=0.7)
+    assert CountingProvider.calls == 3
+    provider(messages)
+    provider(messages)
+    assert CountingProvider.calls == 5
+
+def test_anthropic_tool_definitions_cacheable(test_tool):
+    tools = AnthropicProvider(api_key="test-key")._tool_definitions([test_tool])
+    assert tools[0]["name"] == "test_tool"
+    assert tools[0]["input_schema"]["required"] == ["input"]
+    assert tools[-1]["cache_control"] == {"type": "ephemeral"}
+
+def test_ollama_abatch_runs_concurrently():
+    def handler(request):
+        body = json.loads(request.content)
+        return httpx.Response(200, json={"response": body["prompt"].upper()})
+
+    llm_cache.clear()
+    provider = OllamaProvider("async-model")
+    provider._ahttp = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    batch = [
+        [{"role": "user", "content": "first"}],
+        [{"role": "system", "content": "s"}, {"role": "user", "content": "second"}]
+    ]
+    assert asyncio.run(provider.abatch(batch)) == ["HUMAN: FIRST", "HUMAN: SECOND"]
+
+def test_openai_submit_batch_orders_results():
+    from types import SimpleNamespace
+
+    class FakeClient:
+        def __init__(self):
+            self.files = SimpleNamespace(create=self.create_file, content=self.file_content)
+            self.batches = SimpleNamespace(create=self.create_batch, retrieve=self.retrieve_batch)
+
+        def create_file(self, file, purpose):
+            self.requests = [json.loads(line) for line in file[1].decode().splitlines()]
+            return SimpleNamespace(id="file-in")
+
+        def create_batch(self, **kwargs):
+            return SimpleNamespace(id="batch-1", status="in_progress")
+
+        def retrieve_batch(self, batch_id):
+            return SimpleNamespace(id=batch_id, status="completed", output_file_id="file-out")
+
+        def file_content(self, file_id):
+            lines = [
+                json.dumps({
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"content": request["body"]["messages"][0]["content"]}}]}
+                    }
+                })
+                for request in reversed(self.requests)
+            ]
+            return SimpleNamespace(text="\n".join(lines))
+
+    provider = OpenAIProvider(api_key="test-key")
+    provider.client = FakeClient()
+    batch = [[{"role": "user", "content": "a"}], [{"role": "user", "content": "b"}]]
+    assert provider.submit_batch(batch, poll_interval=0) == ["a", "b"]
+
+def test_ollama_streams_tool_call(test_tool):
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        lines = [json.dumps({"response": part}) for part in ["test_", "tool"]]
+        return httpx.Response(200, text="\n".join(lines))
+
+    provider = OllamaProvider("stream-model")
+    provider._http = httpx.Client(transport=httpx.MockTransport(handler))
+    chunks = provider.get_tool_call([{"role": "user", "content": "hi"}], [test_tool], [], stream=True)
+    assert list(chunks) == ["test_", "tool"]
+
+def test_openai_tool_schemas_are_reused(test_tool):
+    provider = OpenAIProvider(api_key="test-key")
+    from types import SimpleNamespace
+    sent = []
+
+    def fake_api_call(messages, **kwargs):
+        sent.append(kwargs["tools"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=None))])
+
+    provider._make_api_call = fake_api_call
+    provider.get_tool_call([{"role": "user", "content": "hi"}], [test_tool], [])
+    provider.get_tool_call([{"role": "user", "content": "hi"}], [test_tool], [])
+    assert sent[0] is sent[1]
+    assert sent[0][0]["function"]["name"] == "test_tool"
+
+def test_ollama_retries_transient_errors(monkeypatch):
+    statuses = [503, 429, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        return httpx.Response(status, json={"response": "ok"} if status == 200 else {})
+
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    llm_cache.clear()
+    provider = OllamaProvider("retry-model")
+    provider._http = httpx.Client(transport=httpx.MockTransport(handler))
+    assert provider([{"role": "user", "content": "hi"}]) == "ok"
+    assert statuses == []
+
+def test_deepseek_tool_call_retries_transient_errors(monkeypatch, test_tool):
+    statuses = [503, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        body = {"choices": [{"message": {"function_call": {"name": "test_tool"}}}]} if status == 200 else {}
+        return httpx.Response(status, json=body)
+
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    provider = DeepSeekProvider(api_key="test-key")
+    provider._http = httpx.Client(transport=httpx.MockTransport(handler))
+    assert provider.get_tool_call([{"role": "user", "content": "hi"}], [test_tool], []) == {"name": "test_tool"}
+    assert statuses == []
+
+def test_sdk_clients_leave_retries_to_rate_limited():
+    provider = AnthropicProvider(api_key="test-key")
+    assert provider.client.max_retries == 0
+    assert provider.aclient.max_retries == 0
+
+def test_ollama_does_not_retry_client_errors(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={})
+
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    llm_cache.clear()
+    provider = OllamaProvider("retry-model")
+    provider._http = httpx.Client(transport=httpx.MockTransport(handler))
+    with pytest.raises(httpx.HTTPStatusError):
+        provider([{"role": "user", "content": "bad"}])
+    assert len(calls) == 1
+
+def test_ollama_stream_handles_split_lines():
+    body = b'{"response": "Hel"}\n{"resp' + b'onse": "lo"}\n\n{"response": "!", "done": true}'
+
+    def handler(request):
+        return httpx.Response(200, content=iter([body[:10], body[10:25], body[25:]]))
+
+    provider = OllamaProvider("stream-model")
+    provider._http = httpx.Client(transport=httpx.MockTransport(handler))
+    chunks = provider.generate_response([{"role": "user", "content": "hi"}], stream=True)
+    assert list(chunks) == ["Hel", "lo", "!"]
+
+def test_cancel_request_closes_every_open_stream():
+    def handler(request):
+        return httpx.Response(200, content=iter([b'{"response": "a"}\n', b'{"response": "b"}\n']))
+
+    provider = OllamaProvider("stream-model")
+    provider._http = httpx.Client(transport=httpx.MockTransport(handler))
+    first = provider.generate_response([{"role": "user", "content": "one"}], stream=True)
+    second = provider.generate_response([{"role": "user", "content": "two"}], stream=True)
+    provider.cancel_request()
+    with pytest.raises(httpx.StreamClosed):
+        list(first)
+    with pytest.raises(httpx.StreamClosed):
+        list(second)
+
+def test_cancel_request_only_closes_that_requests_streams():
+    def handler(request):
+        return httpx.Response(200, content=iter([b'{"response": "a"}\n', b'{"response": "b"}\n']))
+
+    provider = OllamaProvider("stream-model")
+    provider._http = httpx.Client(transport=httpx.MockTransport(handler))
+    streams = {}
+    for message_id in ("one", "two"):
+        token = request_id.set(message_id)
+        try:
+            streams[message_id] = provider.generate_response([{"role": "user", "content": message_id}], stream=True)
+        finally:
+            request_id.reset(token)
+    provider.cancel_request("one")
+    with pytest.raises(httpx.StreamClosed):
+        list(streams["one"])
+    assert list(streams["two"]) == ["a", "b"]
+
+def test_ollama_sends_model_options():
+    sent = []
+
+    def handler(request):
+        sent.append(json.loads(request.content))
+        return httpx.Response(200, json={"response": "ok"})
+
+    llm_cache.clear()
+    provider = OllamaProvider(num_ctx=2048, num_gpu=1)
+    provider._http = httpx.Client(transport=httpx.MockTransport(handler))
+    provider([{"role": "user", "content": "options"}], stop_sequences=["END"])
+    assert sent[0]["model"] == "qwen2.5-plus:q4_K_M"
+    assert sent[0]["options"] == {"num_ctx": 2048, "num_predict": 512, "num_gpu": 1, "stop": ["END"]}
+
+def test_deepseek_stream_parses_server_sent_events():
+    body = (
+        b": keep-alive\n\n"
+        b'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n'
+        b'data: {"choices": [{"delta": {"content": "lo"}}]}\n\n'
+        b"data: [DONE]\n\n"
+    )
+
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body)
+
+    provider = DeepSeekProvider(api_key="test-key")
+    provider._http = httpx.Client(transport=httpx.MockTransport(handler))
+    chunks = provider.generate_response([{"role": "user", "content": "hi"}], stream=True)
+    assert list(chunks) == ["Hel", "lo"]
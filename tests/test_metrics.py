@@ -0,0 +1,17 @@
+import logging
+from src.metrics import STAGE_SECONDS, RequestIdFilter, request_id, timed
+
+def test_timed_records_stage():
+    before = STAGE_SECONDS.labels(stage="test", provider="mock")._sum.get()
+    with timed("test", "mock"):
+        sum(range(1000))
+    assert STAGE_SECONDS.labels(stage="test", provider="mock")._sum.get() > before
+
+def test_request_id_filter():
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "hello", None, None)
+    token = request_id.set("abc")
+    try:
+        assert RequestIdFilter().filter(record)
+    finally:
+        request_id.reset(token)
+    assert record.request_id == "abc"
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.tools import stock_tools
+from src.tools.stock_tools import StockPredictionTool
+
+class FakeTicker:
+    """Deterministic price history for a ticker, shaped like yf.Ticker.history"""
+    history_calls = 0
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def history(self, start=None, end=None):
+        FakeTicker.history_calls += 1
+        rng = np.random.default_rng(0)
+        index = pd.bdate_range(end="2024-06-28", periods=125)
+        close = 100 + np.cumsum(rng.normal(0, 1, len(index)))
+        volume = rng.integers(1_000_000, 2_000_000, len(index)).astype(float)
+        return pd.DataFrame({"Close": close, "Volume": volume}, index=index)
+
+def fake_download(tickers, start=None, end=None, **kwargs):
+    """Stands in for yf.download, grouping each ticker's history under its symbol"""
+    fake_download.calls += 1
+    return pd.concat({ticker: FakeTicker(ticker).history(start, end) for ticker in tickers}, axis=1)
+
+@pytest.fixture
+def stock_tool(monkeypatch):
+    monkeypatch.setattr(stock_tools.yf, "download", fake_download)
+    fake_download.calls = 0
+    stock_tools._history_cache.clear()
+    stock_tools._model_cache.clear()
+    return StockPredictionTool()
+
+def test_stock_prediction_tool(stock_tool):
+    result = stock_tool.forward("aapl")
+    assert "error" not in result
+    assert result["ticker"] == "AAPL"
+    assert result["current_price"] == FakeTicker("AAPL").history()["Close"].iloc[-1]
+    assert len(result["predictions"]) == 7
+    assert set(result["technical_analysis"]) == {"RSI", "MACD", "Bollinger", "Trend"}
+
+def test_stock_predictions_match_golden_values(stock_tool):
+    # Predictions for the fake history, recorded from the pipeline; catches numeric regressions in the kernels
+    golden = [110.02, 107.11, 107.2, 107.73, 109.67, 107.4, 108.64]
+    result = stock_tool.forward("AAPL")
+    assert np.allclose(list(result["predictions"].values()), golden, atol=0.011)
+
+def test_stock_history_is_fetched_once_per_day(stock_tool):
+    FakeTicker.history_calls = 0
+    first = stock_tool.forward("MSFT")
+    second = stock_tool.forward("msft")
+    assert FakeTicker.history_calls == 1
+    assert first["predictions"] == second["predictions"]
+
+def test_indicators_match_ta():
+    import ta
+    from src.tools._indicators import compute_features
+
+    rng = np.random.default_rng(1)
+    close = pd.Series(100 + np.cumsum(rng.normal(0, 1, 120)))
+    volume = pd.Series(rng.integers(1_000_000, 2_000_000, 120).astype(float))
+    expected = [
+        close,
+        volume,
+        ta.momentum.RSIIndicator(close).rsi(),
+        ta.trend.MACD(close).macd(),
+        ta.volatility.BollingerBands(close).bollinger_hband(),
+        ta.volatility.BollingerBands(close).bollinger_lband(),
+        ta.trend.SMAIndicator(close, window=20).sma_indicator(),
+        ta.trend.EMAIndicator(close, window=20).ema_indicator(),
+        close.pct_change(),
+        volume.pct_change()
+    ]
+    features = compute_features(close.to_numpy(), volume.to_numpy())
+    for actual, reference in zip(features.T, expected):
+        np.testing.assert_allclose(actual, reference.to_numpy(), rtol=1e-6)
+
+def test_predict_next_days_matches_forest_predict(stock_tool):
+    rng = np.random.default_rng(2)
+    X, y = rng.random((60, 20)), rng.random(60)
+    stock_tool.model.fit(X, y)
+    predictions = stock_tool._predict_next_days(stock_tool.model, X[-1], days=3)
+    assert len(predictions) == 3
+    assert predictions[0] == pytest.approx(stock_tool.model.predict(X[-1:].astype(np.float32))[0])
+
+def test_stock_volatility_matches_pandas(stock_tool):
+    result = stock_tool.forward("AAPL")
+    close = pd.Series(stock_tool._get_stock_data("AAPL", FakeTicker("AAPL").history())[:, 0])
+    expected = round(close.pct_change().std() * 100, 2)
+    assert result["confidence_metrics"]["last_30_days_volatility"] == pytest.approx(expected)
+
+def test_stock_model_is_trained_once_per_training_set(stock_tool):
+    rng = np.random.default_rng(3)
+    X, y = rng.random((40, 20)), rng.random(40)
+    model = stock_tool._train(X, y)
+    assert stock_tool._train(X.copy(), y.copy()) is model
+    assert stock_tool._train(X, y + 1) is not model
+
+def test_stock_prediction_batches_downloads(stock_tool):
+    results = stock_tool.forward_many(["aapl", "MSFT", "AAPL"])
+    assert fake_download.calls == 1
+    assert list(results) == ["AAPL", "MSFT"]
+    assert all("error" not in result for result in results.values())
+
+def test_zero_volume_days_are_dropped(stock_tool):
+    history = FakeTicker("AAPL").history()
+    history.iloc[[60, 61, 90], history.columns.get_loc("Volume")] = 0.0
+    features = stock_tool._get_stock_data("AAPL", history)
+    assert np.isfinite(features).all()
+    assert len(features) < len(history) - stock_tools.WARMUP
+
+    stock_tools._history_cache[("AAPL", pd.Timestamp.now().date())] = history
+    result = stock_tool.forward("AAPL")
+    assert "error" not in result
+    assert np.isfinite(list(result["predictions"].values())).all()
@@ -7,6 +7,7 @@ from src.tools.base_tools import (
     TwitterSearchTool,
     SystemInfoTool
 )
+import json
 import os
 import tempfile
 
@@ -50,6 +51,25 @@ def test_system_command_tool(system_command_tool):
     assert isinstance(result, str)
     assert "test" in result
 
+def test_system_command_tool_keeps_output_tail(system_command_tool):
+    system_command_tool.MAX_OUTPUT_LINES = 100
+    result = system_command_tool.forward("seq 1 1000")
+    assert result.splitlines() == [str(i) for i in range(901, 1001)]
+    assert system_command_tool.forward("echo test | tr a-z A-Z").strip() == "TEST"
+
+def test_system_command_tool_caps_long_lines(system_command_tool):
+    system_command_tool.MAX_OUTPUT_LINES = 3
+    system_command_tool.MAX_LINE_LENGTH = 10
+    result = system_command_tool.forward("python -c \"print('x' * 100, end='')\"")
+    assert result == "x" * 30
+
+def test_system_command_tool_runs_shell_builtins(system_command_tool):
+    assert system_command_tool.forward("cd /tmp") == ""
+    assert system_command_tool.forward("echo hi # comment").strip() == "hi"
+
+def test_system_command_tool_applies_env_prefix(system_command_tool):
+    assert "AGENTX_TEST=1" in system_command_tool.forward("AGENTX_TEST=1 env").splitlines()
+
 def test_file_system_tool(file_system_tool):
     # Create a temporary file for testing
     with tempfile.NamedTemporaryFile(delete=False) as tmp:
@@ -73,6 +93,17 @@ def test_file_system_tool(file_system_tool):
     finally:
         os.unlink(tmp_path)
 
+def test_file_system_tool_truncates_large_reads(file_system_tool, tmp_path):
+    path = tmp_path / "large.log"
+    path.write_text("a" * 100 + "b" * 100 + "c" * 100)
+    file_system_tool.MAX_READ_BYTES = 200
+    file_system_tool.EXCERPT_BYTES = 100
+
+    result = file_system_tool.forward("read", str(path))
+    assert result.startswith("a" * 100)
+    assert result.endswith("c" * 100)
+    assert "[100 bytes truncated]" in result
+
 def test_twitter_search_tool(twitter_search_tool):
     if not os.getenv("TWITTER_API_KEY"):
         pytest.skip("Twitter API credentials not available")
@@ -83,22 +114,22 @@ def test_twitter_search_tool(twitter_search_tool):
 
 def test_system_info_tool(system_info_tool):
     # Test CPU metrics
-    cpu_result = system_info_tool.forward("cpu")
+    cpu_result = json.loads(system_info_tool.forward("cpu"))
     assert isinstance(cpu_result, dict)
     assert "cpu_percent" in cpu_result
     assert "cpu_count" in cpu_result
 
     # Test memory metrics
-    memory_result = system_info_tool.forward("memory")
+    memory_result = json.loads(system_info_tool.forward("memory"))
     assert isinstance(memory_result, dict)
     assert "total" in memory_result
     assert "available" in memory_result
     assert "percent" in memory_result
 
     # Test disk metrics
-    disk_result = system_info_tool.forward("disk")
+    disk_result = json.loads(system_info_tool.forward("disk"))
     assert isinstance(disk_result, dict)
     assert "total" in disk_result
     assert "used" in disk_result
     assert "free" in disk_result
-    assert "percent" in disk_result 
\ No newline at end of file
+    assert "percent" in disk_result